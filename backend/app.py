@@ -1,10 +1,10 @@
-from flask import Flask, request, jsonify, send_from_directory, g
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from functools import wraps
 import sys
 import os
-import uuid
+import json
 
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -15,31 +15,77 @@ ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'mov', 'webm'}
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 MAX_VIDEO_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB
 MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024   # 10MB
+MAX_REQUEST_SIZE = 1 * 1024 * 1024         # non-upload routes (JSON bodies)
+MAX_HISTORY_PAGE_SIZE = 200
+MAX_CONTENT_PLAN_BATCH = 20
+MAX_IMAGE_BATCH_PROMPTS = 8
+MAX_IMAGE_VARIANTS = 4  # nano-banana-pro/edit num_images limit
 from database import Database
 from fal_api import FalClient
 from openrouter_client import OpenRouterClient
-from services import CharacterService, ContentService, MediaService, GenerateService
+from llm_cache import ResponseCache
+from services import CharacterService, ContentService, MediaService, GenerateService, PrepareVideoError
+from jobs import JobRunner
+from http_session import get_session
+from file_cleanup import get_cleanup_worker
+from thumbnails import get_thumbnail_worker, ensure_image_thumbnail
+from media_serving import send_media
+from blob_store import get_blob_store
+from uploads import UploadRequest, UploadRule, StreamedUpload
+from werkzeug.exceptions import HTTPException, BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from auth import TokenVerifier, RoleCache
+from idempotency import (IdempotencyStore, IdempotencyConflict, MAX_KEY_LENGTH, IN_PROGRESS_ERROR,
+                         NOT_REPLAYABLE_ERROR)
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from fal_scheduler import get_fal_scheduler, fal_caller, BATCH
+from resilience import get_resilience
 import traceback
 
 app = Flask(__name__)
-CORS(app)
+app.request_class = UploadRequest
+# Global body cap; upload routes get their own limits from UploadRequest.upload_rules
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_SIZE
+CORS(app, expose_headers=['Location', 'X-Next-Cursor', 'Idempotent-Replayed'])
 
 # Initialize
 Config.init_directories()
 db = Database()
+if Config.DB_CACHE_REALTIME:
+    db.start_realtime_invalidation()
 fal_client = FalClient(Config.FAL_KEY)
-llm_client = OpenRouterClient(Config.OPENROUTER_API_KEY, Config.OPENROUTER_MODEL)
+llm_cache = ResponseCache(str(Config.CACHE_DIR / 'llm'), maxsize=Config.LLM_CACHE_SIZE) if Config.LLM_CACHE_ENABLED else None
+llm_client = OpenRouterClient(Config.OPENROUTER_API_KEY, Config.OPENROUTER_MODEL, cache=llm_cache)
 
 char_service = CharacterService(fal_client, llm_client, db)
 content_service = ContentService(llm_client, db)
 media_service = MediaService(fal_client, db)
 generate_service = GenerateService(fal_client, llm_client, db)
+job_runner = JobRunner(db, max_workers=Config.JOB_WORKERS, lease_ttl=Config.JOB_LEASE_TTL)
+idempotency_store = IdempotencyStore(maxsize=Config.IDEMPOTENCY_MAX_KEYS, ttl=Config.IDEMPOTENCY_TTL)
+
+
+def _job_accepted(job_id):
+    """202 response for a queued job; poll GET /api/jobs/<id> for the result."""
+    status_url = f"/api/jobs/{job_id}"
+    response = jsonify({'job_id': job_id, 'status': 'pending', 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
 
 
 # ===== Auth middleware =====
 
 # Shared Supabase client for auth verification
 _auth_client = create_supabase_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+token_verifier = TokenVerifier(
+    _auth_client,
+    Config.SUPABASE_URL,
+    jwt_secret=Config.SUPABASE_JWT_SECRET,
+    mode=Config.AUTH_VERIFY_MODE,
+    cache_size=Config.AUTH_TOKEN_CACHE_SIZE,
+    role_claim=Config.AUTH_ROLE_CLAIM,
+)
+role_cache = RoleCache(db.client, ttl=Config.ROLE_CACHE_TTL)
 
 
 def require_auth(f):
@@ -52,16 +98,15 @@ def require_auth(f):
 
         token = auth_header.split(' ', 1)[1]
         try:
-            user_response = _auth_client.auth.get_user(token)
-            user = user_response.user
-            if not user:
-                return jsonify({'error': 'Invalid token'}), 401
-            g.user_id = user.id
-            g.user_email = user.email
+            user = token_verifier.verify(token)
+            g.user_id = user['id']
+            g.user_email = user['email']
+            g.user_role = user['role']
         except Exception as e:
             return jsonify({'error': f'Authentication failed: {str(e)}'}), 401
 
-        return f(*args, **kwargs)
+        with fal_caller(g.user_id):
+            return f(*args, **kwargs)
     return decorated
 
 
@@ -70,13 +115,104 @@ def require_admin(f):
     @wraps(f)
     @require_auth
     def decorated(*args, **kwargs):
-        result = db.client.table('profiles').select('role').eq('id', g.user_id).maybe_single().execute()
-        if not result.data or result.data.get('role') != 'admin':
+        role = g.user_role or role_cache.get_role(g.user_id)
+        if role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated
 
 
+def idempotent(f):
+    """Honour an Idempotency-Key header (use after @require_auth).
+
+    Keys are scoped to the user and endpoint. A repeat of an in-flight
+    request waits up to IDEMPOTENCY_WAIT_TIMEOUT for it, then gets 409; a
+    repeat of a finished one gets the stored response with
+    `Idempotent-Replayed: true`. Only JSON responses are replayed.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        scoped_key = f"{g.user_id}:{request.endpoint}:{key}"
+        try:
+            future, is_owner = idempotency_store.begin(scoped_key, IdempotencyStore.fingerprint(request.get_data()))
+        except IdempotencyConflict as e:
+            return jsonify({'error': str(e)}), 422
+
+        if not is_owner:
+            try:
+                status, body, headers = future.result(timeout=Config.IDEMPOTENCY_WAIT_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({'error': IN_PROGRESS_ERROR}), 409
+            if body is None:
+                return jsonify({'error': NOT_REPLAYABLE_ERROR}), 409
+            response = jsonify(body)
+            response.status_code = status
+            response.headers.update(headers)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = None
+        try:
+            response = app.make_response(f(*args, **kwargs))
+            return response
+        finally:
+            if response is None:
+                idempotency_store.finish(scoped_key, future, 500, {'error': 'Request failed'})
+            else:
+                headers = {'Location': response.headers['Location']} if 'Location' in response.headers else {}
+                body = response.get_json() if response.is_json else None
+                idempotency_store.finish(scoped_key, future, response.status_code, body, headers)
+    return decorated
+
+
+@app.teardown_request
+def discard_streamed_uploads(exc=None):
+    # Temp files that weren't moved into the store (errors, rejected uploads)
+    for upload in request.streamed_uploads:
+        upload.discard()
+
+
+@app.errorhandler(BadRequest)
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(UnsupportedMediaType)
+def upload_error(e):
+    rule = request.upload_rule
+    if isinstance(e, RequestEntityTooLarge) and rule is not None and e.description == RequestEntityTooLarge.description:
+        # Rejected from Content-Length before any bytes were read
+        return jsonify({'error': f"{rule.label} too large. Maximum {rule.max_size // (1024 * 1024)}MB."}), e.code
+    return jsonify({'error': e.description}), e.code
+
+
+def _store_upload(file, directory, web_dir, prefix, ext):
+    """Move an uploaded file into the content-addressed store; returns its web path."""
+    if isinstance(file.stream, StreamedUpload):
+        upload = file.stream
+        upload.finish()
+        upload.close()
+        return get_blob_store().put_file(upload.path, upload.hexdigest(), directory, web_dir, prefix, ext)
+    return get_blob_store().put_stream(file.stream, directory, web_dir, prefix, ext)
+
+
+def _sse_response(events):
+    """Stream (event, data) pairs from `events` as text/event-stream."""
+    def generate():
+        try:
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok'})
@@ -87,9 +223,14 @@ def health():
 @app.route('/api/admin/users', methods=['GET'])
 @require_admin
 def admin_list_users():
-    """List all users (admin only)."""
+    """List users (admin only). Optional ?limit=&offset= paging."""
     try:
-        result = db.client.table('profiles').select('id, email, role, created_at').order('created_at', desc=True).execute()
+        query = db.client.table('profiles').select('id, email, role, created_at').order('created_at', desc=True)
+        limit = request.args.get('limit', type=int)
+        if limit:
+            offset = request.args.get('offset', 0, type=int)
+            query = query.range(offset, offset + limit - 1)
+        result = query.execute()
         return jsonify(result.data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -116,6 +257,11 @@ def admin_create_user():
             'user_metadata': {'role': role}
         })
 
+        # The signup trigger creates the profile with the default role
+        if role != 'user':
+            db.client.table('profiles').update({'role': role}).eq('id', result.user.id).execute()
+        role_cache.invalidate(result.user.id)
+
         return jsonify({
             'id': result.user.id,
             'email': result.user.email,
@@ -136,11 +282,32 @@ def admin_delete_user(user_id):
             return jsonify({'error': 'Cannot delete yourself'}), 400
 
         db.client.auth.admin.delete_user(user_id)
+        role_cache.invalidate(user_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/metrics', methods=['GET'])
+@require_admin
+def admin_metrics():
+    """Process-local performance counters (admin only)."""
+    return jsonify({
+        'http': get_session().stats(),
+        'fal_upload_cache': fal_client.upload_cache.stats(),
+        'auth': token_verifier.stats(),
+        'role_cache': role_cache.stats(),
+        'db_cache': db.cache.stats(),
+        'file_cleanup': get_cleanup_worker().stats(),
+        'thumbnails': get_thumbnail_worker().stats(),
+        'blob_store': get_blob_store().stats(),
+        'llm_cache': llm_cache.stats() if llm_cache else None,
+        'idempotency': idempotency_store.stats(),
+        'fal_scheduler': get_fal_scheduler().stats(),
+        'resilience': get_resilience().stats(),
+    })
+
+
 # ===== Character endpoints =====
 
 @app.route('/api/characters', methods=['GET'])
@@ -173,16 +340,7 @@ def create_character():
                     if ext not in ALLOWED_IMAGE_EXTENSIONS:
                         return jsonify({'error': f'Invalid image type. Allowed: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'}), 400
 
-                    file.seek(0, 2)
-                    size = file.tell()
-                    file.seek(0)
-                    if size > MAX_IMAGE_UPLOAD_SIZE:
-                        return jsonify({'error': 'Image too large. Maximum 10MB.'}), 400
-
-                    filename = f"char_{uuid.uuid4().hex[:8]}.{ext}"
-                    save_path = Config.IMAGES_DIR / filename
-                    file.save(str(save_path))
-                    image_path = f"/media/images/{filename}"
+                    image_path = _store_upload(file, Config.IMAGES_DIR, '/media/images', 'char', ext)
         else:
             data = request.json
             name = data.get('name')
@@ -199,6 +357,8 @@ def create_character():
             user_id=g.user_id
         )
         return jsonify(character)
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -259,13 +419,72 @@ def create_content_plan():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        plan = content_service.create_content_plan(character, theme)
+        # fresh=true skips the LLM response cache to get a new variation
+        plan = content_service.create_content_plan(character, theme, use_cache=not data.get('fresh'))
         return jsonify(plan)
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/content-plans/batch', methods=['POST'])
+@require_auth
+def create_content_plans_batch():
+    """Create plans for several themes at once. Per-theme errors are returned inline."""
+    try:
+        data = request.json
+        character_id = data.get('character_id')
+        themes = [t for t in (data.get('themes') or []) if isinstance(t, str) and t.strip()]
+
+        if not character_id or not themes:
+            return jsonify({'error': 'Character ID and themes are required'}), 400
+        if len(themes) > MAX_CONTENT_PLAN_BATCH:
+            return jsonify({'error': f'At most {MAX_CONTENT_PLAN_BATCH} themes per batch'}), 400
+
+        character = char_service.get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        results = content_service.create_content_plans(
+            character, themes,
+            max_concurrency=Config.CONTENT_PLAN_BATCH_CONCURRENCY,
+            use_cache=not data.get('fresh'),
+        )
+        return jsonify({'results': results})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/content-plans/stream', methods=['POST'])
+@require_auth
+def stream_content_plan():
+    """SSE: `field` events ({name, value}) as plan fields complete, then `done` with the saved plan."""
+    try:
+        data = request.json
+        character_id = data.get('character_id')
+        theme = data.get('theme')
+
+        if not character_id or not theme:
+            return jsonify({'error': 'Character ID and theme are required'}), 400
+
+        character = char_service.get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        def events():
+            for kind, value in content_service.stream_content_plan(character, theme):
+                if kind == 'field':
+                    yield 'field', {'name': value[0], 'value': value[1]}
+                else:
+                    yield 'done', value
+
+        return _sse_response(events())
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/content-plans/<plan_id>', methods=['GET'])
 @require_auth
 def get_content_plan(plan_id):
@@ -280,6 +499,7 @@ def get_content_plan(plan_id):
 
 @app.route('/api/media/generate', methods=['POST'])
 @require_auth
+@idempotent
 def generate_media():
     """Legacy: Generate media for a content plan."""
     try:
@@ -327,11 +547,28 @@ def get_media_history():
     try:
         character_id = request.args.get('character_id')
         media_type = request.args.get('media_type')
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        fields = request.args.get('fields')
+        include = request.args.get('include', '')
+
         media = db.get_all_media_with_details(
             character_id=character_id if character_id else None,
-            media_type=media_type if media_type else None
+            media_type=media_type if media_type else None,
+            limit=limit,
+            cursor=request.args.get('cursor') or None,
+            fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            include=[i.strip() for i in include.split(',') if i.strip()],
         )
-        return jsonify(media)
+
+        response = jsonify(media)
+        # Keyset pagination: pass X-Next-Cursor back as ?cursor= for the next page
+        if limit and len(media) == limit:
+            response.headers['X-Next-Cursor'] = Database.media_cursor(media[-1])
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -362,26 +599,25 @@ def upload_video():
         if ext not in ALLOWED_VIDEO_EXTENSIONS:
             return jsonify({'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_VIDEO_EXTENSIONS)}'}), 400
 
-        file.seek(0, 2)
-        size = file.tell()
-        file.seek(0)
-        if size > MAX_VIDEO_UPLOAD_SIZE:
-            return jsonify({'error': 'File too large. Maximum 100MB.'}), 400
-
-        filename = f"upload_{uuid.uuid4().hex[:8]}.{ext}"
-        save_path = Config.VIDEOS_DIR / filename
-        file.save(str(save_path))
+        web_path = _store_upload(file, Config.VIDEOS_DIR, '/media/videos', 'upload', ext)
 
         return jsonify({
-            'file_path': str(save_path),
-            'web_path': f"/media/videos/{filename}"
+            'file_path': str(Config.DATA_DIR / web_path[1:]),
+            'web_path': web_path
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+def _run_dreamactor(character, driving_video_path, plan_id):
+    video_url = media_service.generate_dreamactor_video(character, driving_video_path, plan_id)
+    return {'media_type': 'video', 'video_path': video_url}
+
+
 @app.route('/api/media/generate-dreamactor', methods=['POST'])
 @require_auth
 def generate_dreamactor():
@@ -399,12 +635,12 @@ def generate_dreamactor():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        video_url = media_service.generate_dreamactor_video(character, driving_video_path, plan_id)
-
-        return jsonify({
-            'media_type': 'video',
-            'video_path': video_url
-        })
+        job_id = job_runner.submit(
+            g.user_id, character_id, 'video_dreamactor',
+            {'driving_video_path': driving_video_path, 'plan_id': plan_id},
+            _run_dreamactor, character, driving_video_path, plan_id,
+        )
+        return _job_accepted(job_id)
 
     except Exception as e:
         traceback.print_exc()
@@ -415,6 +651,7 @@ def generate_dreamactor():
 
 @app.route('/api/generate/image', methods=['POST'])
 @require_auth
+@idempotent
 def generate_image_v2():
     try:
         data = request.json
@@ -430,7 +667,8 @@ def generate_image_v2():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        result = generate_service.generate_image(character, prompt, option, reference_image_path)
+        result = generate_service.generate_image(character, prompt, option, reference_image_path,
+                                                reuse=bool(data.get('reuse')))
         return jsonify(result)
 
     except Exception as e:
@@ -438,6 +676,41 @@ def generate_image_v2():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/generate/image/batch', methods=['POST'])
+@require_auth
+def generate_images_batch_v2():
+    """Generate `variants` images for each of several prompts. Per-prompt errors are returned inline."""
+    try:
+        data = request.json
+        character_id = data.get('character_id')
+        prompts = [p for p in (data.get('prompts') or []) if isinstance(p, str) and p.strip()]
+        variants = data.get('variants', 1)
+        option = data.get('option', 'ref_image')
+        reference_image_path = data.get('reference_image_path')
+
+        if not character_id or not prompts:
+            return jsonify({'error': 'character_id and prompts are required'}), 400
+        if len(prompts) > MAX_IMAGE_BATCH_PROMPTS:
+            return jsonify({'error': f'At most {MAX_IMAGE_BATCH_PROMPTS} prompts per batch'}), 400
+        if not isinstance(variants, int) or not 1 <= variants <= MAX_IMAGE_VARIANTS:
+            return jsonify({'error': f'variants must be between 1 and {MAX_IMAGE_VARIANTS}'}), 400
+
+        character = char_service.get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        with fal_caller(g.user_id, BATCH):
+            results = generate_service.generate_images(
+                character, prompts, variants, option, reference_image_path,
+                max_concurrency=Config.IMAGE_BATCH_CONCURRENCY, reuse=bool(data.get('reuse')),
+            )
+        return jsonify({'results': results})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/generate/video/prepare', methods=['POST'])
 @require_auth
 def prepare_video_v2():
@@ -455,9 +728,42 @@ def prepare_video_v2():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        result = generate_service.prepare_video(character, concept, option, reference_image_path)
+        result = generate_service.prepare_video(character, concept, option, reference_image_path,
+                                                use_cache=not data.get('fresh'))
         return jsonify(result)
 
+    except PrepareVideoError as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e), 'stages': e.stages, **e.partial}), 502
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/generate/video/prompt/stream', methods=['POST'])
+@require_auth
+def stream_video_prompt_v2():
+    """SSE: `token` events ({text}) as the video prompt is written, then `done` ({video_prompt})."""
+    try:
+        data = request.json
+        character_id = data.get('character_id')
+        concept = data.get('concept')
+
+        if not character_id or not concept:
+            return jsonify({'error': 'character_id and concept are required'}), 400
+
+        character = char_service.get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        def events():
+            parts = []
+            for delta in llm_client.stream_video_prompt(character, concept):
+                parts.append(delta)
+                yield 'token', {'text': delta}
+            yield 'done', {'video_prompt': ''.join(parts).strip()}
+
+        return _sse_response(events())
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -465,6 +771,7 @@ def prepare_video_v2():
 
 @app.route('/api/generate/video/final', methods=['POST'])
 @require_auth
+@idempotent
 def finalize_video_v2():
     try:
         data = request.json
@@ -472,6 +779,7 @@ def finalize_video_v2():
         first_frame_path = data.get('first_frame_path')
         video_prompt = data.get('video_prompt')
         concept = data.get('concept', '')
+        reuse = bool(data.get('reuse'))
 
         if not character_id or not first_frame_path or not video_prompt:
             return jsonify({'error': 'character_id, first_frame_path, and video_prompt are required'}), 400
@@ -480,8 +788,12 @@ def finalize_video_v2():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        result = generate_service.finalize_video(character, first_frame_path, video_prompt, concept)
-        return jsonify(result)
+        job_id = job_runner.submit(
+            g.user_id, character_id, 'video_final',
+            {'first_frame_path': first_frame_path, 'video_prompt': video_prompt, 'concept': concept, 'reuse': reuse},
+            generate_service.finalize_video, character, first_frame_path, video_prompt, concept, reuse=reuse,
+        )
+        return _job_accepted(job_id)
 
     except Exception as e:
         traceback.print_exc()
@@ -504,14 +816,90 @@ def generate_motion_video_v2():
         if not character:
             return jsonify({'error': 'Character not found'}), 404
 
-        result = generate_service.generate_motion_video(character, prompt, driving_video_path)
-        return jsonify(result)
+        job_id = job_runner.submit(
+            g.user_id, character_id, 'video_motion',
+            {'prompt': prompt, 'driving_video_path': driving_video_path},
+            generate_service.generate_motion_video, character, prompt, driving_video_path,
+        )
+        return _job_accepted(job_id)
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+# ===== Job status =====
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    try:
+        job = db.get_job(job_id)
+        if not job or job.get('user_id') != g.user_id:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify({
+            'id': job['id'],
+            'job_type': job['job_type'],
+            'status': job['status'],
+            'result_data': job.get('result_data'),
+            'error_message': job.get('error_message'),
+            'created_at': job.get('created_at'),
+            'updated_at': job.get('updated_at'),
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===== Job recovery =====
+
+def job_character(job):
+    character = char_service.get_character(job['character_id'])
+    if not character:
+        raise ValueError('Character not found')
+    return character
+
+
+def _resume_video_final(job):
+    data = job['input_data']
+    return generate_service.finalize_video(job_character(job), data['first_frame_path'], data['video_prompt'],
+                                           data.get('concept', ''), reuse=data.get('reuse', False))
+
+
+def _resume_video_motion(job):
+    data = job['input_data']
+    return generate_service.generate_motion_video(job_character(job), data['prompt'], data['driving_video_path'])
+
+
+def _resume_video_dreamactor(job):
+    data = job['input_data']
+    return _run_dreamactor(job_character(job), data['driving_video_path'], data.get('plan_id'))
+
+
+# job_type -> fn(job row) that re-runs the job, for JobRunner.recover
+JOB_HANDLERS = {
+    'video_final': _resume_video_final,
+    'video_motion': _resume_video_motion,
+    'video_dreamactor': _resume_video_dreamactor,
+}
+
+
+def recover_jobs(exclude=()):
+    """Resume jobs a previous process left unfinished; fal requests already queued are polled, not re-submitted.
+
+    Called once at startup by every serving process (wsgi.py, asgi.py,
+    `python app.py`). Job leases make it safe for several workers to do
+    so at once: each unfinished job is claimed by exactly one of them.
+    """
+    if not Config.JOB_RECOVERY:
+        return
+    handlers = {job_type: fn for job_type, fn in JOB_HANDLERS.items() if job_type not in exclude}
+    try:
+        job_runner.recover(handlers)
+    except Exception:
+        traceback.print_exc()
+
+
 @app.route('/api/upload/image', methods=['POST'])
 @require_auth
 def upload_image():
@@ -527,21 +915,15 @@ def upload_image():
         if ext not in ALLOWED_IMAGE_EXTENSIONS:
             return jsonify({'error': f'Invalid file type. Allowed: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'}), 400
 
-        file.seek(0, 2)
-        size = file.tell()
-        file.seek(0)
-        if size > MAX_IMAGE_UPLOAD_SIZE:
-            return jsonify({'error': 'File too large. Maximum 10MB.'}), 400
-
-        filename = f"ref_{uuid.uuid4().hex[:8]}.{ext}"
-        save_path = Config.IMAGES_DIR / filename
-        file.save(str(save_path))
+        web_path = _store_upload(file, Config.IMAGES_DIR, '/media/images', 'ref', ext)
 
         return jsonify({
-            'file_path': str(save_path),
-            'web_path': f"/media/images/{filename}"
+            'file_path': str(Config.DATA_DIR / web_path[1:]),
+            'web_path': web_path
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -550,19 +932,37 @@ def upload_image():
 # Serve media files (no auth needed for serving)
 @app.route('/media/images/<filename>')
 def serve_image(filename):
-    return send_from_directory(str(Config.IMAGES_DIR), filename)
+    return send_media(str(Config.IMAGES_DIR), filename)
 
 @app.route('/media/videos/<filename>')
 def serve_video(filename):
-    return send_from_directory(str(Config.VIDEOS_DIR), filename)
+    return send_media(str(Config.VIDEOS_DIR), filename)
+
+@app.route('/media/thumbs/<filename>')
+def serve_thumbnail(filename):
+    filename = secure_filename(filename)
+    if not ensure_image_thumbnail(filename):
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    return send_media(str(Config.THUMBS_DIR), filename)
 
 @app.route('/api/download/images/<filename>')
 def download_image(filename):
-    return send_from_directory(str(Config.IMAGES_DIR), filename, as_attachment=True)
+    return send_media(str(Config.IMAGES_DIR), filename, as_attachment=True)
 
 @app.route('/api/download/videos/<filename>')
 def download_video(filename):
-    return send_from_directory(str(Config.VIDEOS_DIR), filename, as_attachment=True)
+    return send_media(str(Config.VIDEOS_DIR), filename, as_attachment=True)
+
+# Upload endpoints: size limit enforced while streaming, files written straight into place
+UploadRequest.upload_rules = {
+    'create_character': UploadRule(Config.IMAGES_DIR, MAX_IMAGE_UPLOAD_SIZE, ALLOWED_IMAGE_EXTENSIONS, 'Image'),
+    'upload_image': UploadRule(Config.IMAGES_DIR, MAX_IMAGE_UPLOAD_SIZE, ALLOWED_IMAGE_EXTENSIONS, 'File'),
+    'upload_video': UploadRule(Config.VIDEOS_DIR, MAX_VIDEO_UPLOAD_SIZE, ALLOWED_VIDEO_EXTENSIONS, 'File'),
+}
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8000)
+    debug = os.getenv('FLASK_DEBUG', 'true').lower() in ('1', 'true', 'yes')
+    # With the debug reloader the parent process only watches files; the serving child has WERKZEUG_RUN_MAIN set
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        recover_jobs()
+    app.run(debug=debug, port=8000)
@@ -0,0 +1,350 @@
+"""ASGI entry point.
+
+The generation endpoints run natively on one asyncio event loop (fal and
+OpenRouter via their async clients), so a single process can hold
+hundreds of generations in flight without a thread each. Every other
+route is served by the existing Flask app on a small thread pool.
+
+    uvicorn asgi:application --port 8000
+
+`python app.py` keeps working as before (sync only).
+"""
+from quart import Quart, request, jsonify, g
+from a2wsgi import WSGIMiddleware
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config import Config
+import app as flask_app
+from fal_api import AsyncFalClient
+from openrouter_client import AsyncOpenRouterClient
+from services import AsyncGenerateService, PrepareVideoError
+from jobs import AsyncJobRunner
+from idempotency import (IdempotencyStore, IdempotencyConflict, MAX_KEY_LENGTH, IN_PROGRESS_ERROR,
+                         NOT_REPLAYABLE_ERROR)
+from fal_scheduler import fal_caller, BATCH
+import traceback
+
+async_app = Quart(__name__, static_folder=None)
+async_app.config['MAX_CONTENT_LENGTH'] = flask_app.MAX_REQUEST_SIZE
+
+# Shares db, caches and token verification with the Flask app
+fal_client = AsyncFalClient(Config.FAL_KEY, upload_cache=flask_app.fal_client.upload_cache)
+llm_client = AsyncOpenRouterClient(Config.OPENROUTER_API_KEY, Config.OPENROUTER_MODEL, cache=flask_app.llm_cache)
+generate_service = AsyncGenerateService(fal_client, llm_client, flask_app.db)
+job_runner = AsyncJobRunner(flask_app.db, max_concurrency=Config.ASYNC_MAX_JOBS,
+                            lease_ttl=Config.JOB_LEASE_TTL)
+
+
+def _job_accepted(job_id):
+    """202 response for a queued job; poll GET /api/jobs/<id> for the result."""
+    status_url = f"/api/jobs/{job_id}"
+    response = jsonify({'job_id': job_id, 'status': 'pending', 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+
+def require_auth(f):
+    """Async twin of app.require_auth (same verifier and token cache)."""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return jsonify({'error': 'Missing or invalid authorization header'}), 401
+
+        token = auth_header.split(' ', 1)[1]
+        try:
+            user = await asyncio.to_thread(flask_app.token_verifier.verify, token)
+            g.user_id = user['id']
+            g.user_email = user['email']
+            g.user_role = user['role']
+        except Exception as e:
+            return jsonify({'error': f'Authentication failed: {str(e)}'}), 401
+
+        with fal_caller(g.user_id):
+            return await f(*args, **kwargs)
+    return decorated
+
+
+def idempotent(f):
+    """Async twin of app.idempotent; shares its store, so keys span both apps."""
+    store = flask_app.idempotency_store
+
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return await f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        scoped_key = f"{g.user_id}:{request.endpoint}:{key}"
+        try:
+            future, is_owner = store.begin(scoped_key, IdempotencyStore.fingerprint(await request.get_data()))
+        except IdempotencyConflict as e:
+            return jsonify({'error': str(e)}), 422
+
+        if not is_owner:
+            try:
+                # shield: a timed-out waiter must not cancel the owner's Future
+                status, body, headers = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                                               Config.IDEMPOTENCY_WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                return jsonify({'error': IN_PROGRESS_ERROR}), 409
+            if body is None:
+                return jsonify({'error': NOT_REPLAYABLE_ERROR}), 409
+            response = jsonify(body)
+            response.status_code = status
+            response.headers.update(headers)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = None
+        try:
+            response = await async_app.make_response(await f(*args, **kwargs))
+            return response
+        finally:
+            if response is None:
+                store.finish(scoped_key, future, 500, {'error': 'Request failed'})
+            else:
+                headers = {'Location': response.headers['Location']} if 'Location' in response.headers else {}
+                body = await response.get_json() if response.is_json else None
+                store.finish(scoped_key, future, response.status_code, body, headers)
+    return decorated
+
+
+async def _get_character(character_id):
+    return await asyncio.to_thread(flask_app.char_service.get_character, character_id)
+
+
+@async_app.after_request
+async def add_cors_headers(response):
+    # Same policy as CORS(app, expose_headers=...) on the Flask side
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'Location, X-Next-Cursor, Idempotent-Replayed'
+    return response
+
+
+@async_app.before_serving
+async def startup():
+    # Route blocking Supabase/hash calls through a pool sized for the async load
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(
+        max_workers=Config.ASGI_WSGI_WORKERS, thread_name_prefix='asgi-io'))
+
+    # Each uvicorn worker recovers at startup; job leases keep them from sharing a job
+    if Config.JOB_RECOVERY:
+        try:
+            await job_runner.recover(JOB_HANDLERS)
+        except Exception:
+            traceback.print_exc()
+    # Remaining job types run on the Flask app's thread-pool runner
+    await asyncio.to_thread(flask_app.recover_jobs, exclude=set(JOB_HANDLERS))
+
+
+@async_app.after_serving
+async def shutdown():
+    await job_runner.shutdown()
+    await fal_client.aclose()
+
+
+# ===== Async v2 generation endpoints =====
+
+@async_app.route('/api/generate/image', methods=['POST'])
+@require_auth
+@idempotent
+async def generate_image_v2():
+    try:
+        data = await request.get_json()
+        character_id = data.get('character_id')
+        prompt = data.get('prompt')
+        option = data.get('option', 'ref_image')
+        reference_image_path = data.get('reference_image_path')
+
+        if not character_id or not prompt:
+            return jsonify({'error': 'character_id and prompt are required'}), 400
+
+        character = await _get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        result = await generate_service.generate_image(character, prompt, option, reference_image_path,
+                                                      reuse=bool(data.get('reuse')))
+        return jsonify(result)
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@async_app.route('/api/generate/image/batch', methods=['POST'])
+@require_auth
+async def generate_images_batch_v2():
+    try:
+        data = await request.get_json()
+        character_id = data.get('character_id')
+        prompts = [p for p in (data.get('prompts') or []) if isinstance(p, str) and p.strip()]
+        variants = data.get('variants', 1)
+        option = data.get('option', 'ref_image')
+        reference_image_path = data.get('reference_image_path')
+
+        if not character_id or not prompts:
+            return jsonify({'error': 'character_id and prompts are required'}), 400
+        if len(prompts) > flask_app.MAX_IMAGE_BATCH_PROMPTS:
+            return jsonify({'error': f'At most {flask_app.MAX_IMAGE_BATCH_PROMPTS} prompts per batch'}), 400
+        if not isinstance(variants, int) or not 1 <= variants <= flask_app.MAX_IMAGE_VARIANTS:
+            return jsonify({'error': f'variants must be between 1 and {flask_app.MAX_IMAGE_VARIANTS}'}), 400
+
+        character = await _get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        with fal_caller(g.user_id, BATCH):
+            results = await generate_service.generate_images(
+                character, prompts, variants, option, reference_image_path,
+                max_concurrency=Config.IMAGE_BATCH_CONCURRENCY, reuse=bool(data.get('reuse')),
+            )
+        return jsonify({'results': results})
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@async_app.route('/api/generate/video/prepare', methods=['POST'])
+@require_auth
+async def prepare_video_v2():
+    try:
+        data = await request.get_json()
+        character_id = data.get('character_id')
+        concept = data.get('concept')
+        option = data.get('option', 'text_only')
+        reference_image_path = data.get('reference_image_path')
+
+        if not character_id or not concept:
+            return jsonify({'error': 'character_id and concept are required'}), 400
+
+        character = await _get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        result = await generate_service.prepare_video(character, concept, option, reference_image_path,
+                                                      use_cache=not data.get('fresh'))
+        return jsonify(result)
+
+    except PrepareVideoError as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e), 'stages': e.stages, **e.partial}), 502
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@async_app.route('/api/generate/video/final', methods=['POST'])
+@require_auth
+@idempotent
+async def finalize_video_v2():
+    try:
+        data = await request.get_json()
+        character_id = data.get('character_id')
+        first_frame_path = data.get('first_frame_path')
+        video_prompt = data.get('video_prompt')
+        concept = data.get('concept', '')
+        reuse = bool(data.get('reuse'))
+
+        if not character_id or not first_frame_path or not video_prompt:
+            return jsonify({'error': 'character_id, first_frame_path, and video_prompt are required'}), 400
+
+        character = await _get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        job_id = await job_runner.submit(
+            g.user_id, character_id, 'video_final',
+            {'first_frame_path': first_frame_path, 'video_prompt': video_prompt, 'concept': concept, 'reuse': reuse},
+            generate_service.finalize_video, character, first_frame_path, video_prompt, concept, reuse=reuse,
+        )
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@async_app.route('/api/generate/video/motion', methods=['POST'])
+@require_auth
+async def generate_motion_video_v2():
+    try:
+        data = await request.get_json()
+        character_id = data.get('character_id')
+        prompt = data.get('prompt')
+        driving_video_path = data.get('driving_video_path')
+
+        if not character_id or not prompt or not driving_video_path:
+            return jsonify({'error': 'character_id, prompt, and driving_video_path are required'}), 400
+
+        character = await _get_character(character_id)
+        if not character:
+            return jsonify({'error': 'Character not found'}), 404
+
+        job_id = await job_runner.submit(
+            g.user_id, character_id, 'video_motion',
+            {'prompt': prompt, 'driving_video_path': driving_video_path},
+            generate_service.generate_motion_video, character, prompt, driving_video_path,
+        )
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# job_type -> coroutine fn(job row) re-running the job, for AsyncJobRunner.recover
+
+async def _resume_video_final(job):
+    data = job['input_data']
+    character = await asyncio.to_thread(flask_app.job_character, job)
+    return await generate_service.finalize_video(character, data['first_frame_path'], data['video_prompt'],
+                                                 data.get('concept', ''), reuse=data.get('reuse', False))
+
+
+async def _resume_video_motion(job):
+    data = job['input_data']
+    character = await asyncio.to_thread(flask_app.job_character, job)
+    return await generate_service.generate_motion_video(character, data['prompt'], data['driving_video_path'])
+
+
+JOB_HANDLERS = {
+    'video_final': _resume_video_final,
+    'video_motion': _resume_video_motion,
+}
+
+
+# ===== Dispatch =====
+
+wsgi_app = WSGIMiddleware(flask_app.app, workers=Config.ASGI_WSGI_WORKERS)
+_url_adapter = async_app.url_map.bind('')
+
+
+def _is_async_route(scope) -> bool:
+    # OPTIONS preflights stay with flask-cors
+    if scope['method'] == 'OPTIONS':
+        return False
+    try:
+        _url_adapter.match(scope['path'], method=scope['method'])
+        return True
+    except Exception:
+        return False
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan' or (scope['type'] == 'http' and _is_async_route(scope)):
+        await async_app(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,174 @@
+from cache import TTLCache
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+try:
+    import jwt as pyjwt  # PyJWT, only needed for asymmetric (JWKS) tokens
+except ImportError:
+    pyjwt = None
+
+CLOCK_SKEW_SECONDS = 30
+HMAC_ALGORITHMS = {
+    'HS256': hashlib.sha256,
+    'HS384': hashlib.sha384,
+    'HS512': hashlib.sha512,
+}
+
+
+class AuthError(Exception):
+    pass
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _split_token(token: str):
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+        header = json.loads(_b64url_decode(header_b64))
+        payload = json.loads(_b64url_decode(payload_b64))
+        signature = _b64url_decode(signature_b64)
+    except ValueError:
+        raise AuthError('Malformed token')
+    return header, payload, signature, f"{header_b64}.{payload_b64}".encode()
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens, locally where possible.
+
+    HS* tokens are checked against the project JWT secret and RS*/ES*
+    tokens against the project's JWKS (requires PyJWT). Anything that
+    can't be verified locally falls back to `auth.get_user`. Verified
+    tokens are cached until their `exp`.
+    """
+
+    def __init__(self, auth_client, supabase_url: str, jwt_secret: str = '',
+                 mode: str = 'local', cache_size: int = 4096, role_claim: str = ''):
+        self.auth_client = auth_client
+        self.role_claim = role_claim
+        self.jwt_secret = jwt_secret.encode() if jwt_secret else None
+        self.mode = mode
+        self.issuer = f"{supabase_url.rstrip('/')}/auth/v1" if supabase_url else None
+        self.cache = TTLCache(maxsize=cache_size, ttl=0)
+        self.local_verifications = 0
+        self.remote_verifications = 0
+        self._jwks_client = None
+        if pyjwt is not None and supabase_url:
+            self._jwks_client = pyjwt.PyJWKClient(f"{self.issuer}/.well-known/jwks.json",
+                                                  cache_keys=True, lifespan=3600)
+
+    def verify(self, token: str) -> dict:
+        """Return {'id', 'email', 'role'} for a valid token or raise AuthError.
+
+        'role' is the profile role from `role_claim` when the token was
+        verified locally and carries it, otherwise None.
+        """
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        user = self.cache.get(cache_key)
+        if user is not None:
+            return user
+
+        header, payload, signature, signing_input = _split_token(token)
+        claims = None
+        if self.mode == 'local':
+            claims = self._verify_locally(token, header, payload, signature, signing_input)
+
+        if claims is not None:
+            self.local_verifications += 1
+            user = {'id': claims['sub'], 'email': claims.get('email'), 'role': self._role_from_claims(claims)}
+        else:
+            self.remote_verifications += 1
+            user = self._verify_remote(token)
+
+        exp = payload.get('exp')
+        if exp:
+            self.cache.set(cache_key, user, ttl=exp - time.time())
+        return user
+
+    def _verify_locally(self, token, header, payload, signature, signing_input):
+        """Return verified claims, or None if this token can't be checked locally."""
+        alg = header.get('alg')
+        if alg in HMAC_ALGORITHMS:
+            if not self.jwt_secret:
+                return None
+            expected = hmac.new(self.jwt_secret, signing_input, HMAC_ALGORITHMS[alg]).digest()
+            if not hmac.compare_digest(expected, signature):
+                raise AuthError('Invalid token signature')
+            self._check_claims(payload)
+            return payload
+
+        if self._jwks_client is None or not alg or alg == 'none':
+            return None
+        try:
+            key = self._jwks_client.get_signing_key_from_jwt(token).key
+        except pyjwt.PyJWKClientError:
+            return None
+        try:
+            pyjwt.decode(token, key, algorithms=[alg], options={'verify_aud': False, 'verify_exp': False})
+        except pyjwt.InvalidTokenError as e:
+            raise AuthError(str(e))
+        self._check_claims(payload)
+        return payload
+
+    def _role_from_claims(self, claims: dict):
+        if not self.role_claim:
+            return None
+        # Top-level claim from a custom access token hook, or server-controlled app_metadata
+        return claims.get(self.role_claim) or (claims.get('app_metadata') or {}).get(self.role_claim)
+
+    def _check_claims(self, payload: dict):
+        now = time.time()
+        if not payload.get('sub'):
+            raise AuthError('Token has no subject')
+        if 'exp' not in payload or payload['exp'] + CLOCK_SKEW_SECONDS < now:
+            raise AuthError('Token expired')
+        if payload.get('nbf') and payload['nbf'] - CLOCK_SKEW_SECONDS > now:
+            raise AuthError('Token not yet valid')
+        if self.issuer and payload.get('iss') and payload['iss'] != self.issuer:
+            raise AuthError('Invalid token issuer')
+        if payload.get('role') != 'authenticated':
+            raise AuthError('Not a user access token')
+
+    def _verify_remote(self, token: str) -> dict:
+        user = self.auth_client.auth.get_user(token).user
+        if not user:
+            raise AuthError('Invalid token')
+        return {'id': user.id, 'email': user.email, 'role': None}
+
+    def stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'local_verifications': self.local_verifications,
+            'remote_verifications': self.remote_verifications,
+            'cache': self.cache.stats(),
+        }
+
+
+class RoleCache:
+    """TTL cache of `profiles.role` per user id.
+
+    Call `invalidate` whenever a profile's role changes or the user is
+    deleted.
+    """
+
+    def __init__(self, db_client, ttl: float = 300, maxsize: int = 4096):
+        self.db_client = db_client
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get_role(self, user_id: str):
+        role = self.cache.get(user_id)
+        if role is None:
+            result = self.db_client.table('profiles').select('role').eq('id', user_id).maybe_single().execute()
+            role = (result.data or {}).get('role') or ''
+            self.cache.set(user_id, role)
+        return role or None
+
+    def invalidate(self, user_id: str):
+        self.cache.pop(user_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark - bytes moved for repeat gallery loads and video seeking via send_media
+"""
+
+import os
+import sys
+import tempfile
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from media_serving import send_media
+
+NUM_IMAGES = 24
+IMAGE_SIZE = 2 * 1024 * 1024   # roughly a 2K PNG
+VIDEO_SIZE = 20 * 1024 * 1024
+SEEK_CHUNK = 1024 * 1024
+
+
+def main():
+    data_dir = tempfile.mkdtemp()
+    for i in range(NUM_IMAGES):
+        with open(os.path.join(data_dir, f"gen_{i:04d}.png"), 'wb') as f:
+            f.write(os.urandom(IMAGE_SIZE))
+    with open(os.path.join(data_dir, "vid_0000.mp4"), 'wb') as f:
+        f.write(os.urandom(VIDEO_SIZE))
+
+    app = Flask(__name__)
+
+    @app.route('/media/<filename>')
+    def serve(filename):
+        return send_media(data_dir, filename)
+
+    client = app.test_client()
+    names = [f"gen_{i:04d}.png" for i in range(NUM_IMAGES)]
+
+    # Cold gallery load
+    etags = {}
+    cold_bytes = 0
+    for name in names:
+        r = client.get(f"/media/{name}")
+        assert r.status_code == 200
+        cold_bytes += len(r.data)
+        etags[name] = r.headers['ETag']
+    print(f"Cold load:   {NUM_IMAGES} x 200, {cold_bytes / 1e6:.1f} MB body")
+    print(f"  Cache-Control: {r.headers['Cache-Control']}")
+
+    # Repeat gallery load with revalidation
+    warm_bytes = 0
+    statuses = set()
+    for name in names:
+        r = client.get(f"/media/{name}", headers={'If-None-Match': etags[name]})
+        statuses.add(r.status_code)
+        warm_bytes += len(r.data)
+    print(f"Repeat load: statuses {sorted(statuses)}, {warm_bytes} bytes body")
+
+    # Video seeking
+    r = client.get("/media/vid_0000.mp4", headers={'Range': f"bytes={VIDEO_SIZE // 2}-{VIDEO_SIZE // 2 + SEEK_CHUNK - 1}"})
+    print(f"Seek:        {r.status_code}, {len(r.data)} bytes, Content-Range: {r.headers.get('Content-Range')}")
+    r = client.get("/media/vid_0000.mp4", headers={'Range': f"bytes={VIDEO_SIZE * 2}-"})
+    print(f"Bad range:   {r.status_code}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from config import Config
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from supabase import create_client
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+# <prefix>_<sha256[:32]>.<ext>
+BLOB_NAME_RE = re.compile(r'^[a-z]+_[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+class BlobStore:
+    """Content-addressed store for user uploads.
+
+    Files are named `<prefix>_<sha256[:32]>.<ext>`, so uploading the same
+    bytes again returns the existing web path instead of writing a new
+    copy. Whether a blob is still in use is answered by Postgres
+    (`blob_reference_count`): the rows that point at it, plus a grace
+    window after each upload (`blob_uploads`) so a file isn't deleted
+    before the row that will use it is saved. Nothing is counted in
+    process, so any number of workers can share the store. Blobs released
+    while still inside the grace window are picked up again once it
+    expires (see FileCleanupWorker's sweep).
+    """
+
+    def __init__(self, db_client, grace_seconds: int = 3600):
+        self.db_client = db_client
+        self.grace_seconds = grace_seconds
+        self.deleted = 0
+        self.kept = 0
+
+    def put_stream(self, stream, directory: Path, web_dir: str, prefix: str, ext: str) -> str:
+        """Hash `stream` while writing it to a temp file in `directory`, then store it by hash."""
+        directory.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=str(directory), prefix='.upload_', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                    h.update(chunk)
+                    f.write(chunk)
+            return self.put_file(tmp_path, h.hexdigest(), directory, web_dir, prefix, ext)
+        finally:
+            Path(tmp_path).unlink(missing_ok=True)
+
+    def put_file(self, tmp_path: str, digest: str, directory: Path, web_dir: str, prefix: str, ext: str) -> str:
+        """Move an already-hashed temp file into the store.
+
+        The upload is recorded before the file is put in place, and the
+        rename happens even if the blob exists, so a concurrent release of
+        the same blob can't leave the returned path dangling.
+        """
+        filename = f"{prefix}_{digest[:32]}.{ext}"
+        web_path = f"{web_dir}/{filename}"
+        self.db_client.table('blob_uploads').upsert({
+            'web_path': web_path,
+            'uploaded_at': datetime.now(timezone.utc).isoformat(),
+        }).execute()
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, directory / filename)
+        return web_path
+
+    @staticmethod
+    def is_blob(web_path: str) -> bool:
+        return bool(BLOB_NAME_RE.match(web_path.rsplit('/', 1)[-1]))
+
+    def reference_count(self, web_path: str) -> int:
+        result = self.db_client.rpc('blob_reference_count', {
+            'p_web_path': web_path,
+            'p_grace_seconds': self.grace_seconds,
+        }).execute()
+        return result.data or 0
+
+    def release(self, web_path: str):
+        """Delete the blob at `web_path` if nothing references it any more.
+
+        Call after the referencing row is gone. Returns None if the path
+        isn't a stored blob, True if the file was deleted, False if it is
+        still in use (or inside its upload grace window, in which case
+        sweep() releases it later).
+        """
+        if not self.is_blob(web_path):
+            return None
+        if self.reference_count(web_path) > 0:
+            self.kept += 1
+            return False
+        Path(Config.DATA_DIR / web_path[1:]).unlink(missing_ok=True)
+        self.deleted += 1
+        return True
+
+    def expired_uploads(self, limit: int = 500) -> tuple[list[str], str]:
+        """Web paths whose upload grace window has run out, and the cutoff used."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=self.grace_seconds)).isoformat()
+        result = self.db_client.table('blob_uploads').select('web_path') \
+            .lt('uploaded_at', cutoff).limit(limit).execute()
+        return [row['web_path'] for row in result.data or []], cutoff
+
+    def forget_upload(self, web_path: str, cutoff: str):
+        """Drop an expired upload record (unless the blob was uploaded again since `cutoff`)."""
+        self.db_client.table('blob_uploads').delete() \
+            .eq('web_path', web_path).lt('uploaded_at', cutoff).execute()
+
+    def stats(self) -> dict:
+        return {
+            'deleted': self.deleted,
+            'kept': self.kept,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide BlobStore backed by the Supabase database."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore(create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY),
+                                   grace_seconds=Config.BLOB_UPLOAD_GRACE)
+    return _store
@@ -8,18 +8,100 @@ class Config:
     FAL_KEY = os.getenv('FAL_KEY')
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
     OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'moonshotai/kimi-k2')
+    # Opt-in LLM response cache (memory LRU + files under DATA_DIR/cache/llm)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1024'))
     SUPABASE_URL = os.getenv('SUPABASE_URL', '')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY', '')
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET', '')
+    # 'local' verifies JWTs in-process (remote get_user as fallback), 'remote' always calls Supabase Auth
+    AUTH_VERIFY_MODE = os.getenv('AUTH_VERIFY_MODE', 'local')
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '4096'))
+    # Optional custom access-token claim carrying the profile role (e.g. 'user_role')
+    AUTH_ROLE_CLAIM = os.getenv('AUTH_ROLE_CLAIM', '')
+    ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL', '300'))
+    # Idempotency-Key records for generation endpoints
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', str(24 * 3600)))
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+    # Seconds a repeat waits for the in-flight original before getting 409
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '30'))
     DATA_DIR = Path(os.getenv('DATA_DIR', './data'))
 
+    # Read-through cache for characters / content plans
+    DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '2048'))
+    DB_CACHE_TTL = int(os.getenv('DB_CACHE_TTL', '60'))
+    # Invalidate the cache from Supabase realtime (for multi-process deployments)
+    DB_CACHE_REALTIME = os.getenv('DB_CACHE_REALTIME', '').lower() in ('1', 'true', 'yes')
+
+    # Background job executor (video generation)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    # On startup, take over jobs whose owning process stopped renewing their lease
+    JOB_RECOVERY = os.getenv('JOB_RECOVERY', 'true').lower() in ('1', 'true', 'yes')
+    # Seconds a process's claim on a job row lasts without renewal (renewed every third of that)
+    JOB_LEASE_TTL = float(os.getenv('JOB_LEASE_TTL', '90'))
+    # Fan-out pool for independent steps inside one generation (fal + LLM)
+    GENERATE_WORKERS = int(os.getenv('GENERATE_WORKERS', '8'))
+    # Concurrent LLM calls per batch content-plan request
+    CONTENT_PLAN_BATCH_CONCURRENCY = int(os.getenv('CONTENT_PLAN_BATCH_CONCURRENCY', '4'))
+    # Concurrent fal requests per batch image request
+    IMAGE_BATCH_CONCURRENCY = int(os.getenv('IMAGE_BATCH_CONCURRENCY', '4'))
+
+    # ASGI entry point (asgi.py): async jobs in flight on the event loop, threads for the Flask fallback
+    ASYNC_MAX_JOBS = int(os.getenv('ASYNC_MAX_JOBS', '500'))
+    ASGI_WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', '16'))
+
+    # Seconds after an upload during which its blob is kept even if no row references it yet
+    BLOB_UPLOAD_GRACE = int(os.getenv('BLOB_UPLOAD_GRACE', '3600'))
+    # Seconds between sweeps that delete unreferenced blobs once their grace window has passed
+    BLOB_SWEEP_INTERVAL = float(os.getenv('BLOB_SWEEP_INTERVAL', '600'))
+
+    # Shared HTTP session for result downloads
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '120'))
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.5'))
+
+    # fal upload URL cache (keyed by file SHA-256)
+    FAL_UPLOAD_CACHE_SIZE = int(os.getenv('FAL_UPLOAD_CACHE_SIZE', '512'))
+    FAL_UPLOAD_CACHE_TTL = int(os.getenv('FAL_UPLOAD_CACHE_TTL', str(6 * 3600)))
+    FAL_UPLOAD_CACHE_FILE = os.getenv('FAL_UPLOAD_CACHE_FILE', '')
+    # Threads for concurrent fal uploads / result downloads
+    FAL_IO_WORKERS = int(os.getenv('FAL_IO_WORKERS', '8'))
+
+    # Seconds between fal queue status polls for submitted video requests
+    FAL_POLL_INTERVAL = float(os.getenv('FAL_POLL_INTERVAL', '2'))
+    # Seconds a job waits on a submitted fal request (through outages included) before failing
+    FAL_POLL_TIMEOUT = float(os.getenv('FAL_POLL_TIMEOUT', '3600'))
+    # fal call scheduling: concurrent calls per endpoint ("endpoint=n,..." overrides the default)
+    FAL_DEFAULT_CONCURRENCY = int(os.getenv('FAL_DEFAULT_CONCURRENCY', '4'))
+    FAL_ENDPOINT_CONCURRENCY = os.getenv('FAL_ENDPOINT_CONCURRENCY', '')
+    # Optional per-user token bucket for fal calls: FAL_USER_RATE calls/second refill, up to
+    # FAL_USER_BURST banked. Off by default (rate 0): fair queuing already shares endpoint slots
+    # between users, so only set this to hard-cap heavy users. Keep the burst at least one
+    # full image batch (8 requests) plus a video pipeline so neither stalls on the bucket.
+    FAL_USER_RATE = float(os.getenv('FAL_USER_RATE', '0'))
+    FAL_USER_BURST = int(os.getenv('FAL_USER_BURST', '16'))
+    # Fair-queuing weight of interactive requests relative to batch/background jobs (1.0)
+    FAL_INTERACTIVE_WEIGHT = float(os.getenv('FAL_INTERACTIVE_WEIGHT', '4'))
+
+    # Retries and circuit breakers around fal / OpenRouter calls
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1.0'))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+    BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+
     # Ensure directories exist
     CHARACTERS_DIR = DATA_DIR / 'characters'
     CONTENT_PLANS_DIR = DATA_DIR / 'content_plans'
     IMAGES_DIR = DATA_DIR / 'media' / 'images'
     VIDEOS_DIR = DATA_DIR / 'media' / 'videos'
+    THUMBS_DIR = DATA_DIR / 'media' / 'thumbs'
+    CACHE_DIR = DATA_DIR / 'cache'
 
     @classmethod
     def init_directories(cls):
         for dir_path in [cls.CHARACTERS_DIR, cls.CONTENT_PLANS_DIR,
-                         cls.IMAGES_DIR, cls.VIDEOS_DIR]:
+                         cls.IMAGES_DIR, cls.VIDEOS_DIR, cls.THUMBS_DIR]:
             dir_path.mkdir(parents=True, exist_ok=True)
@@ -1,11 +1,77 @@
 from supabase import create_client
-from datetime import datetime
+from datetime import datetime, timezone
 from config import Config
+from cache import TTLCache
+from thumbnails import media_thumbnail_urls
+import asyncio
+import base64
+import copy
+import threading
+import traceback
+import uuid
 
 
 class Database:
     def __init__(self):
         self.client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+        # Read-through cache for characters and content plans. Keys:
+        # ('character', id), ('content_plan', id), ('characters', user_id)
+        self.cache = TTLCache(maxsize=Config.DB_CACHE_SIZE, ttl=Config.DB_CACHE_TTL)
+
+    def _cached(self, key, loader):
+        value = self.cache.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.cache.set(key, value)
+        # Callers mutate returned dicts (e.g. plan overrides), so hand out copies
+        return copy.deepcopy(value)
+
+    def invalidate_character(self, character_id, user_id=None):
+        self.cache.pop(('character', character_id))
+        if user_id:
+            self.cache.pop(('characters', user_id))
+        else:
+            self.cache.pop_where(lambda k, v: k[0] == 'characters'
+                                 and any(c.get('id') == character_id for c in v))
+
+    def invalidate_content_plan(self, plan_id):
+        self.cache.pop(('content_plan', plan_id))
+
+    def apply_change(self, table, record=None, old_record=None):
+        """Invalidate cache entries affected by a row change in `table`."""
+        row = record or old_record or {}
+        if table == 'characters' and row.get('id'):
+            self.invalidate_character(row['id'], row.get('user_id'))
+        elif table == 'content_plans' and row.get('id'):
+            self.invalidate_content_plan(row['id'])
+
+    def start_realtime_invalidation(self):
+        """Keep the cache coherent across processes via Supabase realtime.
+
+        Runs an async realtime client on a daemon thread and feeds
+        characters / content_plans changes into `apply_change`.
+        """
+        def on_change(payload):
+            data = payload.get('data', payload)
+            self.apply_change(data.get('table'), data.get('record'), data.get('old_record'))
+
+        async def listen():
+            from supabase import acreate_client
+            client = await acreate_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+            channel = client.channel('db-cache-invalidation')
+            for table in ('characters', 'content_plans'):
+                channel.on_postgres_changes('*', schema='public', table=table, callback=on_change)
+            await channel.subscribe()
+            await asyncio.Event().wait()
+
+        def run():
+            try:
+                asyncio.run(listen())
+            except Exception:
+                traceback.print_exc()
+
+        threading.Thread(target=run, name='db-cache-realtime', daemon=True).start()
 
     # Character operations
     def save_character(self, character):
@@ -23,60 +89,54 @@ class Database:
             'created_at': character.get('created_at', datetime.now().isoformat()),
         }
         self.client.table('characters').upsert(data).execute()
+        self.invalidate_character(character['id'], character['user_id'])
 
     def get_all_characters(self, user_id=None):
-        query = self.client.table('characters').select('*').order('created_at', desc=True)
-        if user_id:
-            query = query.eq('user_id', user_id)
-        result = query.execute()
-        return result.data
+        def load():
+            query = self.client.table('characters').select('*').order('created_at', desc=True)
+            if user_id:
+                query = query.eq('user_id', user_id)
+            return query.execute().data
+
+        if not user_id:
+            return load()
+        return self._cached(('characters', user_id), load)
 
     def get_character(self, character_id):
-        result = self.client.table('characters').select('*').eq('id', character_id).maybe_single().execute()
-        return result.data
+        return self._cached(
+            ('character', character_id),
+            lambda: self.client.table('characters').select('*').eq('id', character_id).maybe_single().execute().data,
+        )
 
     def delete_character(self, character_id):
-        """Delete character and all related data. Returns list of media file paths to delete."""
-        # Collect media file paths for cleanup
-        media_result = self.client.table('media').select('file_path, first_frame_path').eq('character_id', character_id).execute()
-
-        # Also collect media linked via content_plans
-        plans_result = self.client.table('content_plans').select('id').eq('character_id', character_id).execute()
-        plan_ids = [p['id'] for p in plans_result.data]
-
-        plan_media = []
-        if plan_ids:
-            plan_media_result = self.client.table('media').select('file_path, first_frame_path').in_('plan_id', plan_ids).execute()
-            plan_media = plan_media_result.data
-
-        file_paths = []
-        for row in media_result.data + plan_media:
-            if row.get('file_path'):
-                file_paths.append(row['file_path'])
-            if row.get('first_frame_path'):
-                file_paths.append(row['first_frame_path'])
-
-        # Get character image_path
-        char = self.get_character(character_id)
-        if char and char.get('image_path'):
-            file_paths.append(char['image_path'])
-
-        # Delete media rows
-        self.client.table('media').delete().eq('character_id', character_id).execute()
-        if plan_ids:
-            self.client.table('media').delete().in_('plan_id', plan_ids).execute()
-
-        # Delete content plans
-        self.client.table('content_plans').delete().eq('character_id', character_id).execute()
-
-        # Delete character
-        self.client.table('characters').delete().eq('id', character_id).execute()
+        """Delete character and all related data. Returns list of media file paths to delete.
+
+        Runs as a single `delete_character_cascade` RPC; the FKs cascade to
+        content_plans and media, and set character_id to NULL on jobs.
+        """
+        result = self.client.rpc('delete_character_cascade', {'p_character_id': character_id}).execute()
+        file_paths = result.data or []
+
+        self.invalidate_character(character_id)
+        self.cache.pop_where(lambda k, v: k[0] == 'content_plan' and v.get('character_id') == character_id)
 
         return file_paths
 
     # Content plan operations
     def save_content_plan(self, plan):
-        data = {
+        self.client.table('content_plans').upsert(self._content_plan_row(plan)).execute()
+        self.invalidate_content_plan(plan['id'])
+
+    def save_content_plans(self, plans):
+        """Upsert several plans in a single request."""
+        if not plans:
+            return
+        self.client.table('content_plans').upsert([self._content_plan_row(p) for p in plans]).execute()
+        for plan in plans:
+            self.invalidate_content_plan(plan['id'])
+
+    def _content_plan_row(self, plan):
+        return {
             'id': plan['id'],
             'character_id': plan['character_id'],
             'title': plan.get('title'),
@@ -89,7 +149,6 @@ class Database:
             'call_to_action': plan.get('call_to_action'),
             'created_at': plan.get('created_at', datetime.now().isoformat()),
         }
-        self.client.table('content_plans').upsert(data).execute()
 
     def get_content_plans(self, character_id=None):
         query = self.client.table('content_plans').select('*').order('created_at', desc=True)
@@ -98,8 +157,10 @@ class Database:
         return query.execute().data
 
     def get_content_plan(self, plan_id):
-        result = self.client.table('content_plans').select('*').eq('id', plan_id).maybe_single().execute()
-        return result.data
+        return self._cached(
+            ('content_plan', plan_id),
+            lambda: self.client.table('content_plans').select('*').eq('id', plan_id).maybe_single().execute().data,
+        )
 
     # Media operations
     def save_media(self, plan_id, media_type, file_path):
@@ -114,9 +175,30 @@ class Database:
     def save_media_v2(self, character_id, media_type, file_path,
                       generation_mode=None, prompt=None, video_prompt=None,
                       first_frame_path=None, reference_image_path=None,
-                      plan_id=None):
+                      plan_id=None, input_hash=None):
         """Save media with extended v2 fields"""
-        data = {
+        data = self._media_v2_row(character_id, media_type, file_path, generation_mode, prompt,
+                                  video_prompt, first_frame_path, reference_image_path, plan_id, input_hash)
+        result = self.client.table('media').insert(data).execute()
+        return result.data[0]['id'] if result.data else None
+
+    def save_media_v2_bulk(self, items):
+        """Insert several v2 media rows in one request.
+
+        `items` are dicts of save_media_v2 keyword arguments. Returns the new
+        ids in the same order.
+        """
+        if not items:
+            return []
+        rows = [self._media_v2_row(**item) for item in items]
+        result = self.client.table('media').insert(rows).execute()
+        return [row['id'] for row in result.data]
+
+    def _media_v2_row(self, character_id, media_type, file_path,
+                      generation_mode=None, prompt=None, video_prompt=None,
+                      first_frame_path=None, reference_image_path=None,
+                      plan_id=None, input_hash=None):
+        return {
             'plan_id': plan_id,
             'character_id': character_id,
             'media_type': media_type,
@@ -126,28 +208,109 @@ class Database:
             'video_prompt': video_prompt,
             'first_frame_path': first_frame_path,
             'reference_image_path': reference_image_path,
+            'input_hash': input_hash,
             'created_at': datetime.now().isoformat(),
         }
-        result = self.client.table('media').insert(data).execute()
-        return result.data[0]['id'] if result.data else None
+
+    def find_media_by_input_hash(self, character_id, input_hash):
+        """Newest completed media row of a character generated from the same inputs."""
+        result = (self.client.table('media').select('*')
+                  .eq('character_id', character_id)
+                  .eq('input_hash', input_hash)
+                  .eq('status', 'completed')
+                  .order('created_at', desc=True)
+                  .limit(1)
+                  .execute())
+        return result.data[0] if result.data else None
+
+    def find_media_by_input_hashes(self, character_id, input_hashes):
+        """Completed media rows of a character for several input hashes: {hash: [rows, newest first]}."""
+        result = (self.client.table('media').select('*')
+                  .eq('character_id', character_id)
+                  .in_('input_hash', list(input_hashes))
+                  .eq('status', 'completed')
+                  .order('created_at', desc=True)
+                  .execute())
+        rows = {}
+        for row in result.data:
+            rows.setdefault(row['input_hash'], []).append(row)
+        return rows
 
     def get_media(self, plan_id):
         result = self.client.table('media').select('*').eq('plan_id', plan_id).order('created_at', desc=True).execute()
         return result.data
 
-    def get_all_media_with_details(self, character_id=None, media_type=None):
-        """Get all media with character and plan details via joins."""
-        # Use a Postgres function or multiple queries
-        # Since Supabase supports foreign key joins via select syntax:
-        query = self.client.table('media').select(
-            '*, characters!media_character_id_fkey(name, id, image_path), '
-            'content_plans!media_plan_id_fkey(title, theme, hook, first_frame_prompt, video_prompt, call_to_action, duration_seconds)'
-        ).order('created_at', desc=True)
+    # Flattened output field -> source column for get_all_media_with_details
+    MEDIA_FIELDS = ('id', 'plan_id', 'media_type', 'file_path', 'created_at', 'character_id',
+                    'generation_mode', 'prompt', 'video_prompt', 'first_frame_path', 'reference_image_path')
+    MEDIA_CHARACTER_FIELDS = {'character_name': 'name', 'character_image_path': 'image_path'}
+    MEDIA_PLAN_FIELDS = {
+        'plan_title': 'title',
+        'plan_theme': 'theme',
+        'hook': 'hook',
+        'plan_first_frame_prompt': 'first_frame_prompt',
+        'plan_video_prompt': 'video_prompt',
+        'call_to_action': 'call_to_action',
+        'duration_seconds': 'duration_seconds',
+    }
+
+    @staticmethod
+    def media_cursor(item):
+        """Opaque keyset cursor pointing just past `item` in history order."""
+        raw = f"{item['created_at']}|{item['id']}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_media_cursor(cursor):
+        """(created_at, id) from a media_cursor() value, re-serialised so it is safe to put in a filter."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            created_at, media_id = raw.split('|', 1)
+            return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(media_id))
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError('Invalid cursor')
+
+    def get_all_media_with_details(self, character_id=None, media_type=None, limit=None,
+                                   cursor=None, fields=None, include=()):
+        """Get media with character (and optionally plan) details, newest first.
+
+        Args:
+            limit: Max rows to return (no limit if None)
+            cursor: Value from media_cursor() of the last item of the previous page
+            fields: Output fields to return (default: all); id and created_at are always included.
+                'thumbnails' maps size -> WebP URL (None for videos without a poster).
+            include: Extra joins to add; 'plan' joins content_plans
+        """
+        wanted = set(fields) if fields else None
+
+        def want(field):
+            return wanted is None or field in wanted
+
+        columns = [c for c in self.MEDIA_FIELDS if want(c) or c in ('id', 'created_at')]
+        with_thumbnails = want('thumbnails')
+        select_columns = columns + [c for c in ('media_type', 'file_path', 'first_frame_path')
+                                    if with_thumbnails and c not in columns]
+        char_fields = {k: v for k, v in self.MEDIA_CHARACTER_FIELDS.items() if want(k)}
+        plan_fields = {k: v for k, v in self.MEDIA_PLAN_FIELDS.items() if want(k)} if 'plan' in include else {}
+
+        select = ', '.join(select_columns)
+        if char_fields:
+            select += f", characters!media_character_id_fkey({', '.join(char_fields.values())})"
+        if plan_fields:
+            select += f", content_plans!media_plan_id_fkey({', '.join(plan_fields.values())})"
+
+        query = self.client.table('media').select(select).order('created_at', desc=True).order('id', desc=True)
 
         if character_id:
             query = query.eq('character_id', character_id)
         if media_type:
             query = query.eq('media_type', media_type)
+        if cursor:
+            created_at, media_id = self._decode_media_cursor(cursor)
+            query = query.or_(f'created_at.lt."{created_at}",'
+                              f'and(created_at.eq."{created_at}",id.lt."{media_id}")')
+        if limit:
+            query = query.limit(limit)
 
         result = query.execute()
 
@@ -156,26 +319,67 @@ class Database:
         for row in result.data:
             char = row.get('characters') or {}
             plan = row.get('content_plans') or {}
-            items.append({
-                'id': row['id'],
-                'plan_id': row.get('plan_id'),
-                'media_type': row['media_type'],
-                'file_path': row['file_path'],
-                'created_at': row['created_at'],
-                'character_id': row.get('character_id'),
-                'character_name': char.get('name', ''),
-                'character_image_path': char.get('image_path', ''),
-                'generation_mode': row.get('generation_mode'),
-                'prompt': row.get('prompt'),
-                'video_prompt': row.get('video_prompt'),
-                'first_frame_path': row.get('first_frame_path'),
-                'reference_image_path': row.get('reference_image_path'),
-                'plan_title': plan.get('title'),
-                'plan_theme': plan.get('theme'),
-                'hook': plan.get('hook'),
-                'plan_first_frame_prompt': plan.get('first_frame_prompt'),
-                'plan_video_prompt': plan.get('video_prompt'),
-                'call_to_action': plan.get('call_to_action'),
-                'duration_seconds': plan.get('duration_seconds'),
-            })
+            item = {c: row.get(c) for c in columns}
+            if with_thumbnails:
+                item['thumbnails'] = media_thumbnail_urls(row.get('media_type'), row.get('file_path'),
+                                                          row.get('first_frame_path'))
+            for field, column in char_fields.items():
+                item[field] = char.get(column, '')
+            for field, column in plan_fields.items():
+                item[field] = plan.get(column)
+            items.append(item)
         return items
+
+    # Job operations
+    def create_job(self, job):
+        data = {
+            'id': job['id'],
+            'user_id': job['user_id'],
+            'character_id': job['character_id'],
+            'job_type': job['job_type'],
+            'status': job.get('status', 'pending'),
+            'input_data': job.get('input_data', {}),
+            'worker_id': job.get('worker_id'),
+            'lease_expires_at': job.get('lease_expires_at'),
+        }
+        self.client.table('jobs').insert(data).execute()
+
+    def update_job(self, job_id, **fields):
+        self.client.table('jobs').update(fields).eq('id', job_id).execute()
+
+    def get_job(self, job_id):
+        result = self.client.table('jobs').select('*').eq('id', job_id).maybe_single().execute()
+        return result.data
+
+    @staticmethod
+    def _job_lease_lapsed():
+        now = datetime.now(timezone.utc).isoformat()
+        return f'lease_expires_at.is.null,lease_expires_at.lt."{now}"'
+
+    def get_unfinished_jobs(self, job_types):
+        """Pending / processing jobs of the given types whose lease has lapsed, oldest first."""
+        result = (self.client.table('jobs').select('*')
+                  .in_('status', ['pending', 'processing'])
+                  .in_('job_type', list(job_types))
+                  .or_(self._job_lease_lapsed())
+                  .order('created_at')
+                  .execute())
+        return result.data
+
+    def claim_job(self, job_id, status, worker_id, lease_expires_at):
+        """Lease a job to `worker_id` if it is still in `status` with a lapsed lease.
+
+        A single conditional UPDATE, so only one of several workers racing
+        for the same row gets it. Returns whether this call claimed it.
+        """
+        result = (self.client.table('jobs')
+                  .update({'worker_id': worker_id, 'lease_expires_at': lease_expires_at})
+                  .eq('id', job_id)
+                  .eq('status', status)
+                  .or_(self._job_lease_lapsed())
+                  .execute())
+        return bool(result.data)
+
+    def renew_job_leases(self, job_ids, worker_id, lease_expires_at):
+        (self.client.table('jobs').update({'lease_expires_at': lease_expires_at})
+         .in_('id', list(job_ids)).eq('worker_id', worker_id).execute())
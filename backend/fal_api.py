@@ -1,32 +1,271 @@
 import fal_client as fal
-import requests
+import fal_client.client
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from config import Config
+from fal_scheduler import get_fal_scheduler
+from resilience import CircuitOpenError, get_resilience, is_retryable
+from http_session import get_session
+from upload_cache import UploadCache
 
-class FalClient:
+# fal_client retries each HTTP request itself (up to 10 attempts, no public
+# switch). Turn that off so Resilience is the only retry loop and a call is
+# attempted at most RETRY_MAX_ATTEMPTS times.
+fal_client.client.MAX_ATTEMPTS = 1
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Request arguments that carry uploaded-file URLs
+URL_ARGUMENTS = ('image_url', 'image_urls', 'video_url')
+
+
+class FalPollTimeout(Exception):
+    """A queued fal request didn't finish within FAL_POLL_TIMEOUT."""
+
+    def __init__(self, application: str, request_id: str):
+        super().__init__(f"fal request {request_id} on {application} did not finish "
+                         f"within {Config.FAL_POLL_TIMEOUT:g}s")
+        self.application = application
+        self.request_id = request_id
+
+
+def _poll_delay(exc, failures: int, deadline: float, application: str, request_id: str) -> float:
+    """Seconds to wait before polling a queued request again after `exc`.
+
+    An open breaker or a transient error is waited out rather than raised:
+    the request is already queued (and paid for), so giving up on it would
+    waste it. Other errors are re-raised, and so is FalPollTimeout once
+    the wait would pass `deadline`.
+    """
+    if isinstance(exc, CircuitOpenError):
+        delay = exc.retry_in
+    elif is_retryable(exc):
+        delay = min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * 2 ** failures)
+    else:
+        raise exc
+    _check_deadline(deadline, delay, application, request_id)
+    return delay
+
+
+def _check_deadline(deadline: float, delay: float, application: str, request_id: str):
+    if time.monotonic() + delay > deadline:
+        raise FalPollTimeout(application, request_id)
+
+
+class FalRequestTracker:
+    """Links queued fal requests made inside a job to that job's row.
+
+    `on_submit(request_id)` is called as soon as a request is queued, before
+    waiting on it. With `resume_request_id`, the first queued request polls
+    that earlier request instead of submitting a new one.
+    """
+
+    def __init__(self, on_submit, resume_request_id: str = None):
+        self.on_submit = on_submit
+        self.resume_request_id = resume_request_id
+
+    def take_resume(self):
+        request_id, self.resume_request_id = self.resume_request_id, None
+        return request_id
+
+
+_request_tracker = ContextVar('fal_request_tracker', default=None)
+
+
+@contextmanager
+def track_fal_requests(on_submit, resume_request_id: str = None):
+    """Report (and optionally resume) queued fal requests made inside the block."""
+    token = _request_tracker.set(FalRequestTracker(on_submit, resume_request_id))
+    try:
+        yield
+    finally:
+        _request_tracker.reset(token)
+
+
+class FalRequests:
+    """Request builders and fingerprinting shared by FalClient and AsyncFalClient.
+
+    Builders return (application, arguments). Subclasses provide `upload_cache`.
+    """
+
+    @staticmethod
+    def _character_image_request(prompt: str):
+        return "fal-ai/nano-banana-pro", {
+            "prompt": prompt,
+            "image_size": "square_hd",
+            "num_images": 1
+        }
+
+    @staticmethod
+    def _scene_request(prompt: str, image_urls: list[str], num_images: int):
+        # Use Nano Banana Pro Edit for img2img
+        return "fal-ai/nano-banana-pro/edit", {
+            "prompt": prompt,
+            "image_urls": image_urls,
+            "num_images": num_images,
+            "aspect_ratio": "9:16",  # Vertical for social media
+            "resolution": "2K"
+        }
+
+    @staticmethod
+    def _video_request(prompt: str, duration: int, image_url: str = None):
+        # Use image-to-video if image is provided, otherwise text-to-video
+        arguments = {
+            "prompt": prompt,
+            "duration": min(duration, 15),
+            "aspect_ratio": "9:16",  # Vertical for social media
+            "resolution": "720p"
+        }
+        if image_url:
+            return "xai/grok-imagine-video/image-to-video", {**arguments, "image_url": image_url}
+        return "xai/grok-imagine-video/text-to-video", arguments
+
+    @staticmethod
+    def _dreamactor_request(face_image_url: str, driving_video_url: str):
+        return "fal-ai/bytedance/dreamactor/v2", {
+            "face_image_url": face_image_url,
+            "driving_video_url": driving_video_url,
+        }
+
+    @staticmethod
+    def _motion_request(image_url: str, video_url: str, prompt: str):
+        return "fal-ai/kling-video/v2.6/standard/motion-control", {
+            "image_url": image_url,
+            "video_url": video_url,
+            "prompt": prompt,
+            "character_orientation": "video",
+        }
+
+    def request_fingerprint(self, request, file_paths: list[str]) -> str:
+        """Stable hash of a built request plus the contents of its local input files.
+
+        Used to recognise a repeat of an earlier generation. URL arguments
+        are ignored (they change per upload); the files stand in for them.
+        """
+        application, arguments = request
+        payload = {
+            'application': application,
+            'arguments': {k: v for k, v in arguments.items() if k not in URL_ARGUMENTS},
+            'files': [self.upload_cache.digest(p) for p in file_paths],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class FalClient(FalRequests):
     def __init__(self, api_key: str):
         fal.api_key = api_key
+        self.http = get_session()
+        self.upload_cache = UploadCache(
+            maxsize=Config.FAL_UPLOAD_CACHE_SIZE,
+            ttl=Config.FAL_UPLOAD_CACHE_TTL,
+            store_path=Config.FAL_UPLOAD_CACHE_FILE or None,
+        )
+        self._io_pool = ThreadPoolExecutor(max_workers=Config.FAL_IO_WORKERS,
+                                           thread_name_prefix='fal-io')
+        self.scheduler = get_fal_scheduler()
+        self.resilience = get_resilience()
+
+    def _run(self, application: str, arguments: dict) -> dict:
+        """fal.run once the scheduler grants a slot on `application`, retrying transient failures.
+
+        The slot is released between attempts so backoff doesn't hold it.
+        """
+        def attempt():
+            with self.scheduler.slot(application):
+                return fal.run(application, arguments=arguments)
+        return self.resilience.call(f"fal:{application}", attempt)
+
+    def _queue(self, application: str, arguments: dict) -> dict:
+        """Submit to fal's queue and poll until the result is ready.
+
+        Inside track_fal_requests the request id is reported right after
+        submitting, so a restarted process can pick the request up again
+        instead of paying for a new one. The scheduler slot is held while
+        polling since the request occupies the endpoint until it finishes.
+        Polling rides out fal outages (see _poll_delay) but gives up with
+        FalPollTimeout after FAL_POLL_TIMEOUT seconds. A request that failed
+        on fal's side raises from fal.result.
+        """
+        endpoint = f"fal:{application}"
+        tracker = _request_tracker.get()
+        with self.scheduler.slot(application):
+            request_id = tracker.take_resume() if tracker else None
+            if request_id is None:
+                handle = self.resilience.call(endpoint, fal.submit, application, arguments=arguments)
+                request_id = handle.request_id
+                if tracker:
+                    tracker.on_submit(request_id)
+
+            deadline = time.monotonic() + Config.FAL_POLL_TIMEOUT
+            while not isinstance(self._poll(endpoint, deadline, fal.status, application, request_id),
+                                 fal.Completed):
+                _check_deadline(deadline, Config.FAL_POLL_INTERVAL, application, request_id)
+                time.sleep(Config.FAL_POLL_INTERVAL)
+            return self._poll(endpoint, deadline, fal.result, application, request_id)
+
+    def _poll(self, endpoint: str, deadline: float, fn, application: str, request_id: str):
+        """resilience.call for a queued request, retried until `deadline` (see _poll_delay)."""
+        failures = 0
+        while True:
+            try:
+                return self.resilience.call(endpoint, fn, application, request_id)
+            except Exception as e:
+                delay = _poll_delay(e, failures, deadline, application, request_id)
+            failures += 1
+            time.sleep(delay)
+
+    def _download(self, url: str, save_path: str) -> str:
+        """Stream a result file to disk with bounded memory.
+
+        Chunks go to a temp file next to `save_path`, which is checked
+        against Content-Length, fsynced and then atomically renamed, so a
+        partially written file never shows up under its final name.
+        """
+        target = Path(save_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.http.get(url, stream=True) as response:
+            response.raise_for_status()
+            expected = response.headers.get('Content-Length')
+            if response.headers.get('Content-Encoding'):
+                expected = None  # length is of the encoded body
+
+            fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=f".{target.name}.", suffix='.part')
+            try:
+                written = 0
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if expected is not None and written != int(expected):
+                    raise IOError(f"Incomplete download from {url}: got {written} of {expected} bytes")
+
+                os.replace(tmp_path, target)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+        return save_path
 
     def generate_character_image(self, prompt: str, save_path: str) -> str:
         """Generate character image using Nano Banana Pro (text-to-image)"""
-        result = fal.run(
-            "fal-ai/nano-banana-pro",
-            arguments={
-                "prompt": prompt,
-                "image_size": "square_hd",
-                "num_images": 1
-            }
-        )
+        result = self._run(*self._character_image_request(prompt))
 
         # Download and save image
         image_url = result['images'][0]['url']
-        response = requests.get(image_url)
-        response.raise_for_status()
-
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-
-        return save_path
+        return self._download(image_url, save_path)
 
     def generate_scene_image_from_character(self, prompt: str, image_paths: list[str], save_path: str) -> str:
         """Generate scene-specific image using character photo(s) as reference (image-to-image).
@@ -36,38 +275,49 @@ class FalClient:
             image_paths: List of local file paths (1-2 images: ID photo, optional reference)
             save_path: Where to save the result
         """
-        # Upload all images to get public URLs
-        image_urls = [self.upload_file(p) for p in image_paths]
+        return self.generate_scene_images(prompt, save_paths=[save_path], image_paths=image_paths)[0]
 
-        # Use Nano Banana Pro Edit for img2img
-        result = fal.run(
-            "fal-ai/nano-banana-pro/edit",
-            arguments={
-                "prompt": prompt,
-                "image_urls": image_urls,
-                "num_images": 1,
-                "aspect_ratio": "9:16",  # Vertical for social media
-                "resolution": "2K"
-            }
-        )
+    def generate_scene_images(self, prompt: str, save_paths: list[str], image_paths: list[str] = None,
+                              image_urls: list[str] = None) -> list[str]:
+        """Generate len(save_paths) variants of one scene in a single request.
 
-        # Download and save image
-        image_url = result['images'][0]['url']
-        response = requests.get(image_url)
-        response.raise_for_status()
+        Args:
+            prompt: Generation prompt
+            save_paths: Where to save each variant (1-4)
+            image_paths: Local reference images to upload (ID photo, optional reference)
+            image_urls: Already-uploaded reference URLs; skips the upload step
+        """
+        if image_urls is None:
+            # Upload all images to get public URLs
+            image_urls = self.upload_files(image_paths)
 
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        result = self._run(*self._scene_request(prompt, image_urls, len(save_paths)))
 
-        return save_path
+        # Download and save images in parallel
+        result_urls = [img['url'] for img in result['images']][:len(save_paths)]
+        if len(result_urls) == 1:
+            return [self._download(result_urls[0], save_paths[0])]
+        return list(self._io_pool.map(self._download, result_urls, save_paths[:len(result_urls)]))
 
     def upload_file(self, file_path: str) -> str:
-        """Upload a local file to fal.ai and return public URL"""
-        from fal_client import upload_file
-        url = upload_file(file_path)
+        """Upload a local file to fal.ai and return public URL.
+
+        Files are keyed by SHA-256, so re-uploading the same content
+        (e.g. a character's ID photo) returns the cached URL until it expires.
+        """
+        digest = self.upload_cache.digest(file_path)
+        url = self.upload_cache.get(digest)
+        if url is None:
+            url = self.resilience.call('fal:storage', fal.upload_file, file_path)
+            self.upload_cache.set(digest, url)
         return url
 
+    def upload_files(self, file_paths: list[str]) -> list[str]:
+        """Upload several files concurrently, preserving order."""
+        if len(file_paths) <= 1:
+            return [self.upload_file(p) for p in file_paths]
+        return list(self._io_pool.map(self.upload_file, file_paths))
+
     def generate_video(self, prompt: str, duration: int, save_path: str, image_url: str = None, image_path: str = None) -> str:
         """Generate video using Grok Imagine - with image input for consistency
 
@@ -80,41 +330,11 @@ class FalClient:
         if image_path and not image_url:
             image_url = self.upload_file(image_path)
 
-        # Use image-to-video if image is provided, otherwise text-to-video
-        if image_url:
-            result = fal.subscribe(
-                "xai/grok-imagine-video/image-to-video",
-                arguments={
-                    "prompt": prompt,
-                    "image_url": image_url,
-                    "duration": min(duration, 15),
-                    "aspect_ratio": "9:16",  # Vertical for social media
-                    "resolution": "720p"
-                },
-                with_logs=True
-            )
-        else:
-            result = fal.subscribe(
-                "xai/grok-imagine-video/text-to-video",
-                arguments={
-                    "prompt": prompt,
-                    "duration": min(duration, 15),
-                    "aspect_ratio": "9:16",  # Vertical for social media
-                    "resolution": "720p"
-                },
-                with_logs=True
-            )
+        result = self._queue(*self._video_request(prompt, duration, image_url))
 
         # Download and save video
         video_url = result['video']['url']
-        response = requests.get(video_url)
-        response.raise_for_status()
-
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
-
-        return save_path
+        return self._download(video_url, save_path)
 
     def generate_dreamactor_video(self, face_image_path: str, driving_video_path: str, save_path: str) -> str:
         """Generate motion-transfer video using DreamActor V2 (legacy).
@@ -124,27 +344,12 @@ class FalClient:
             driving_video_path: Local path to driving video (motion source)
             save_path: Local path to save output video
         """
-        face_image_url = self.upload_file(face_image_path)
-        driving_video_url = self.upload_file(driving_video_path)
-
-        result = fal.subscribe(
-            "fal-ai/bytedance/dreamactor/v2",
-            arguments={
-                "face_image_url": face_image_url,
-                "driving_video_url": driving_video_url,
-            },
-            with_logs=True
-        )
-
-        video_url = result['video']['url']
-        response = requests.get(video_url)
-        response.raise_for_status()
+        face_image_url, driving_video_url = self.upload_files([face_image_path, driving_video_path])
 
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        result = self._queue(*self._dreamactor_request(face_image_url, driving_video_url))
 
-        return save_path
+        video_url = result['video']['url']
+        return self._download(video_url, save_path)
 
     def generate_motion_control_video(self, image_path: str, video_path: str, prompt: str, save_path: str) -> str:
         """Generate video using Kling Motion Control.
@@ -155,26 +360,141 @@ class FalClient:
             prompt: Text prompt describing the video
             save_path: Local path to save output video
         """
-        image_url = self.upload_file(image_path)
-        video_url = self.upload_file(video_path)
-
-        result = fal.subscribe(
-            "fal-ai/kling-video/v2.6/standard/motion-control",
-            arguments={
-                "image_url": image_url,
-                "video_url": video_url,
-                "prompt": prompt,
-                "character_orientation": "video",
-            },
-            with_logs=True
-        )
+        image_url, video_url = self.upload_files([image_path, video_path])
+
+        result = self._queue(*self._motion_request(image_url, video_url, prompt))
 
         out_video_url = result['video']['url']
-        response = requests.get(out_video_url)
-        response.raise_for_status()
+        return self._download(out_video_url, save_path)
+
+
+class AsyncFalClient(FalRequests):
+    """asyncio counterpart of FalClient built on fal_client's async API.
 
-        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+    Has the FalClient methods the async routes use, as coroutines with the
+    same names. Downloads use a pooled httpx.AsyncClient; the upload URL
+    cache can be shared with a sync FalClient.
+    """
+
+    def __init__(self, api_key: str, upload_cache: UploadCache = None):
+        fal.api_key = api_key
+        self.upload_cache = upload_cache or UploadCache(
+            maxsize=Config.FAL_UPLOAD_CACHE_SIZE,
+            ttl=Config.FAL_UPLOAD_CACHE_TTL,
+            store_path=Config.FAL_UPLOAD_CACHE_FILE or None,
+        )
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(Config.HTTP_READ_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=Config.HTTP_POOL_SIZE),
+            transport=httpx.AsyncHTTPTransport(retries=Config.HTTP_RETRIES),
+            follow_redirects=True,
+        )
+        self.scheduler = get_fal_scheduler()
+        self.resilience = get_resilience()
+
+    async def _run(self, application: str, arguments: dict) -> dict:
+        async def attempt():
+            async with self.scheduler.aslot(application):
+                return await fal.run_async(application, arguments=arguments)
+        return await self.resilience.acall(f"fal:{application}", attempt)
+
+    async def _queue(self, application: str, arguments: dict) -> dict:
+        endpoint = f"fal:{application}"
+        tracker = _request_tracker.get()
+        async with self.scheduler.aslot(application):
+            request_id = tracker.take_resume() if tracker else None
+            if request_id is None:
+                handle = await self.resilience.acall(endpoint, fal.submit_async, application, arguments=arguments)
+                request_id = handle.request_id
+                if tracker:
+                    await asyncio.to_thread(tracker.on_submit, request_id)
+
+            deadline = time.monotonic() + Config.FAL_POLL_TIMEOUT
+            while not isinstance(await self._poll(endpoint, deadline, fal.status_async, application, request_id),
+                                 fal.Completed):
+                _check_deadline(deadline, Config.FAL_POLL_INTERVAL, application, request_id)
+                await asyncio.sleep(Config.FAL_POLL_INTERVAL)
+            return await self._poll(endpoint, deadline, fal.result_async, application, request_id)
+
+    async def _poll(self, endpoint: str, deadline: float, fn, application: str, request_id: str):
+        failures = 0
+        while True:
+            try:
+                return await self.resilience.acall(endpoint, fn, application, request_id)
+            except Exception as e:
+                delay = _poll_delay(e, failures, deadline, application, request_id)
+            failures += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def _download(self, url: str, save_path: str) -> str:
+        """Async version of FalClient._download (chunked, verified, atomic rename)."""
+        target = Path(save_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        async with self.http.stream('GET', url) as response:
+            response.raise_for_status()
+            expected = response.headers.get('Content-Length')
+            if response.headers.get('Content-Encoding'):
+                expected = None  # length is of the encoded body
+
+            fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=f".{target.name}.", suffix='.part')
+            try:
+                written = 0
+                with os.fdopen(fd, 'wb') as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+                    f.flush()
+                    await asyncio.to_thread(os.fsync, f.fileno())
+
+                if expected is not None and written != int(expected):
+                    raise IOError(f"Incomplete download from {url}: got {written} of {expected} bytes")
+
+                os.replace(tmp_path, target)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
 
         return save_path
+
+    async def upload_file(self, file_path: str) -> str:
+        digest = await asyncio.to_thread(self.upload_cache.digest, file_path)
+        url = self.upload_cache.get(digest)
+        if url is None:
+            url = await self.resilience.acall('fal:storage', fal.upload_file_async, file_path)
+            self.upload_cache.set(digest, url)
+        return url
+
+    async def upload_files(self, file_paths: list[str]) -> list[str]:
+        return list(await asyncio.gather(*(self.upload_file(p) for p in file_paths)))
+
+    async def generate_scene_image_from_character(self, prompt: str, image_paths: list[str], save_path: str) -> str:
+        return (await self.generate_scene_images(prompt, save_paths=[save_path], image_paths=image_paths))[0]
+
+    async def generate_scene_images(self, prompt: str, save_paths: list[str], image_paths: list[str] = None,
+                                    image_urls: list[str] = None) -> list[str]:
+        if image_urls is None:
+            image_urls = await self.upload_files(image_paths)
+
+        result = await self._run(*self._scene_request(prompt, image_urls, len(save_paths)))
+
+        result_urls = [img['url'] for img in result['images']][:len(save_paths)]
+        return list(await asyncio.gather(*(self._download(u, p) for u, p in zip(result_urls, save_paths))))
+
+    async def generate_video(self, prompt: str, duration: int, save_path: str, image_url: str = None,
+                             image_path: str = None) -> str:
+        if image_path and not image_url:
+            image_url = await self.upload_file(image_path)
+
+        result = await self._queue(*self._video_request(prompt, duration, image_url))
+        return await self._download(result['video']['url'], save_path)
+
+    async def generate_motion_control_video(self, image_path: str, video_path: str, prompt: str,
+                                            save_path: str) -> str:
+        image_url, video_url = await self.upload_files([image_path, video_path])
+
+        result = await self._queue(*self._motion_request(image_url, video_url, prompt))
+        return await self._download(result['video']['url'], save_path)
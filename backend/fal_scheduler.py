@@ -0,0 +1,275 @@
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from config import Config
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# (user_id, priority) of whoever is making fal calls in this context
+_caller = ContextVar('fal_caller', default=(None, INTERACTIVE))
+
+
+@contextmanager
+def fal_caller(user_id, priority: str = INTERACTIVE):
+    """Attribute fal calls made inside the block to `user_id` at `priority`.
+
+    Context variables don't follow work onto plain executor threads; submit
+    with contextvars.copy_context().run to carry the caller along.
+    """
+    token = _caller.set((user_id, priority))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+class TokenBucket:
+    """Per-user call rate limit. `rate` tokens/second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token, going into debt if needed; returns when it is actually available."""
+        if self.rate <= 0:
+            return now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return now if self.tokens >= 0 else now + -self.tokens / self.rate
+
+
+class _Ticket:
+    __slots__ = ('endpoint_id', 'user_id', 'priority', 'start_tag', 'finish_tag',
+                 'eligible_at', 'enqueued_at', 'future', 'state')
+
+    def __init__(self, endpoint_id, user_id, priority, start_tag, finish_tag, eligible_at, enqueued_at):
+        self.endpoint_id = endpoint_id
+        self.user_id = user_id
+        self.priority = priority
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.eligible_at = eligible_at
+        self.enqueued_at = enqueued_at
+        self.future = Future()
+        self.state = 'queued'  # -> running -> done, or queued -> cancelled
+
+
+class _Endpoint:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.queue = []  # heap of (finish_tag, seq, ticket)
+        self.virtual_time = 0.0
+        self.user_finish = {}
+
+
+class FalScheduler:
+    """Admission control for fal model calls.
+
+    Each fal endpoint (application id) has a concurrency limit. Callers
+    waiting for a slot are served by weighted fair queuing (lowest virtual
+    finish tag first; virtual time advances by start tags): every user
+    gets an equal share of an endpoint, and interactive requests weigh
+    `interactive_weight` times a batch request, so one user's batch of
+    motion-control jobs can't starve someone else's single image. An
+    optional per-user token bucket (off when `user_rate` is 0) can
+    additionally cap how fast a user starts calls at all.
+
+    Works from threads (`slot`) and coroutines (`aslot`); waiters hold a
+    Future, not a thread, on the async side.
+    """
+
+    def __init__(self, default_limit: int = 4, endpoint_limits: dict = None,
+                 user_rate: float = 0, user_burst: int = 1, interactive_weight: float = 4.0):
+        self.default_limit = max(1, default_limit)
+        self.endpoint_limits = endpoint_limits or {}
+        self.user_rate = user_rate
+        self.user_burst = max(1, user_burst)
+        self.weights = {INTERACTIVE: interactive_weight, BATCH: 1.0}
+        self._endpoints = {}
+        self._buckets = {}
+        self._users = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_due = None
+
+    def _endpoint(self, endpoint_id) -> _Endpoint:
+        ep = self._endpoints.get(endpoint_id)
+        if ep is None:
+            ep = self._endpoints[endpoint_id] = _Endpoint(self.endpoint_limits.get(endpoint_id, self.default_limit))
+        return ep
+
+    def _user_stats(self, user_id) -> dict:
+        stats = self._users.get(user_id)
+        if stats is None:
+            stats = self._users[user_id] = {'queued': 0, 'running': 0, 'started': 0,
+                                            'total_wait': 0.0, 'max_wait': 0.0}
+        return stats
+
+    def submit(self, endpoint_id: str, user_id=None, priority: str = None) -> _Ticket:
+        """Queue a call; the ticket's future resolves when it may start. Defaults to the current fal_caller."""
+        ctx_user, ctx_priority = _caller.get()
+        user_id = ctx_user if user_id is None else user_id
+        priority = priority or ctx_priority
+
+        with self._lock:
+            now = time.monotonic()
+            ep = self._endpoint(endpoint_id)
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+
+            start = max(ep.virtual_time, ep.user_finish.get(user_id, 0.0))
+            finish = start + 1.0 / self.weights.get(priority, 1.0)
+            ep.user_finish[user_id] = finish
+
+            ticket = _Ticket(endpoint_id, user_id, priority, start, finish, bucket.reserve(now), now)
+            heapq.heappush(ep.queue, (finish, next(self._seq), ticket))
+            self._user_stats(user_id)['queued'] += 1
+            self._dispatch(ep, now)
+        return ticket
+
+    def _dispatch(self, ep: _Endpoint, now: float):
+        """Start queued tickets while the endpoint has free slots. Caller holds the lock."""
+        while ep.running < ep.limit and ep.queue:
+            ready = [entry for entry in ep.queue if entry[2].eligible_at <= now]
+            if not ready:
+                self._wake_at(min(entry[2].eligible_at for entry in ep.queue))
+                return
+            entry = min(ready)
+            ep.queue.remove(entry)
+            heapq.heapify(ep.queue)
+            ticket = entry[2]
+
+            stats = self._user_stats(ticket.user_id)
+            stats['queued'] -= 1
+            if not ticket.future.set_running_or_notify_cancel():
+                ticket.state = 'cancelled'
+                continue
+
+            wait = now - ticket.enqueued_at
+            ticket.state = 'running'
+            ep.running += 1
+            ep.virtual_time = max(ep.virtual_time, ticket.start_tag)
+            stats['running'] += 1
+            stats['started'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+            ticket.future.set_result(wait)
+
+    def _wake_at(self, due: float):
+        # One timer re-runs dispatch when the earliest rate-limited ticket becomes eligible
+        if self._timer_due is not None and self._timer_due <= due:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = threading.Timer(max(0.0, due - time.monotonic()), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = self._timer_due = None
+            now = time.monotonic()
+            for ep in self._endpoints.values():
+                self._dispatch(ep, now)
+
+    def release(self, ticket: _Ticket):
+        """Finish a running ticket, or withdraw a queued one."""
+        with self._lock:
+            ep = self._endpoint(ticket.endpoint_id)
+            stats = self._user_stats(ticket.user_id)
+            if ticket.state == 'running':
+                ep.running -= 1
+                stats['running'] -= 1
+            elif ticket.state == 'queued':
+                ep.queue = [entry for entry in ep.queue if entry[2] is not ticket]
+                heapq.heapify(ep.queue)
+                stats['queued'] -= 1
+            ticket.state = 'done'
+            self._dispatch(ep, time.monotonic())
+
+    @contextmanager
+    def slot(self, endpoint_id: str):
+        """Block until a slot on `endpoint_id` is granted; hold it for the with-block."""
+        ticket = self.submit(endpoint_id)
+        try:
+            ticket.future.result()
+            yield
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, endpoint_id: str):
+        ticket = self.submit(endpoint_id)
+        try:
+            await asyncio.wrap_future(ticket.future)
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            oldest = {}
+            for ep in self._endpoints.values():
+                for _, _, ticket in ep.queue:
+                    oldest[ticket.user_id] = max(oldest.get(ticket.user_id, 0.0), now - ticket.enqueued_at)
+            return {
+                'endpoints': {
+                    endpoint_id: {'limit': ep.limit, 'running': ep.running, 'queued': len(ep.queue)}
+                    for endpoint_id, ep in self._endpoints.items()
+                },
+                'users': {
+                    str(user_id): {
+                        'queued': s['queued'],
+                        'running': s['running'],
+                        'started': s['started'],
+                        'avg_wait': round(s['total_wait'] / s['started'], 3) if s['started'] else 0.0,
+                        'max_wait': round(s['max_wait'], 3),
+                        'oldest_queued_wait': round(oldest.get(user_id, 0.0), 3),
+                    }
+                    for user_id, s in self._users.items()
+                },
+            }
+
+
+def _parse_limits(spec: str) -> dict:
+    limits = {}
+    for item in spec.split(','):
+        if '=' in item:
+            endpoint_id, limit = item.rsplit('=', 1)
+            limits[endpoint_id.strip()] = int(limit)
+    return limits
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_fal_scheduler() -> FalScheduler:
+    """Process-wide FalScheduler shared by the sync and async fal clients."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FalScheduler(
+                    default_limit=Config.FAL_DEFAULT_CONCURRENCY,
+                    endpoint_limits=_parse_limits(Config.FAL_ENDPOINT_CONCURRENCY),
+                    user_rate=Config.FAL_USER_RATE,
+                    user_burst=Config.FAL_USER_BURST,
+                    interactive_weight=Config.FAL_INTERACTIVE_WEIGHT,
+                )
+    return _scheduler
@@ -0,0 +1,101 @@
+from config import Config
+from pathlib import Path
+from thumbnails import THUMBNAIL_SIZES, thumbnail_filename
+from blob_store import get_blob_store
+import queue
+import threading
+import time
+import traceback
+
+
+class FileCleanupWorker:
+    """Deletes media files on a background thread.
+
+    `enqueue` takes /media/... web paths and returns immediately; the
+    worker unlinks them from DATA_DIR one by one. Every `sweep_interval`
+    seconds it also revisits uploads whose grace window has expired, so a
+    blob kept only because its row was deleted right after uploading it
+    isn't left on disk for good.
+    """
+
+    def __init__(self, sweep_interval: float = 600):
+        self.queue = queue.Queue()
+        self.sweep_interval = sweep_interval
+        self.deleted = 0
+        self.failed = 0
+        self.swept = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._thread = threading.Thread(target=self._run, name='file-cleanup', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, web_paths):
+        """Queue files for deletion; uploaded blobs are only removed once unreferenced (see BlobStore.release)."""
+        for web_path in web_paths:
+            if web_path and web_path.startswith('/media/'):
+                self.queue.put(web_path)
+
+    def _run(self):
+        while True:
+            timeout = self._next_sweep - time.monotonic()
+            if timeout <= 0:
+                self._sweep()
+                continue
+            try:
+                web_path = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            try:
+                self.delete(web_path)
+                self.deleted += 1
+            except Exception:
+                self.failed += 1
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def _sweep(self):
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        store = get_blob_store()
+        try:
+            web_paths, cutoff = store.expired_uploads()
+            for web_path in web_paths:
+                if self.delete(web_path):
+                    self.swept += 1
+                store.forget_upload(web_path, cutoff)
+        except Exception:
+            self.failed += 1
+            traceback.print_exc()
+
+    def delete(self, web_path: str) -> bool:
+        """Remove a file and its thumbnails; False if it is a blob still in use."""
+        # Deduplicated uploads may be shared; the file goes only once no row references it
+        released = get_blob_store().release(web_path)
+        if released is False:
+            return False
+        if released is None:
+            Path(Config.DATA_DIR / web_path[1:]).unlink(missing_ok=True)
+        for size in THUMBNAIL_SIZES:
+            (Config.THUMBS_DIR / thumbnail_filename(web_path, size)).unlink(missing_ok=True)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.queue.qsize(),
+            'deleted': self.deleted,
+            'failed': self.failed,
+            'swept': self.swept,
+        }
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_cleanup_worker() -> FileCleanupWorker:
+    """Process-wide FileCleanupWorker."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = FileCleanupWorker(sweep_interval=Config.BLOB_SWEEP_INTERVAL)
+    return _worker
@@ -0,0 +1,83 @@
+import threading
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PooledSession:
+    """Keep-alive HTTP session shared by all worker threads.
+
+    Connections are pooled per host (fal CDN, storage, ...), every
+    request gets connect/read timeouts and idempotent methods are retried
+    with exponential backoff.
+    """
+
+    def __init__(self, pool_size: int = 16, connect_timeout: float = 10,
+                 read_timeout: float = 120, retries: int = 3, backoff: float = 0.5):
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        # Downloads never need cookies; keeping the jar empty avoids
+        # sharing mutable state between threads.
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.timeout = (connect_timeout, read_timeout)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def stats(self) -> dict:
+        """Connection counters summed over all host pools."""
+        pools = self.adapter.poolmanager.pools
+        requests_made = connections = 0
+        pool_list = [pool for pool in (pools.get(key) for key in pools.keys()) if pool is not None]
+        for pool in pool_list:
+            requests_made += pool.num_requests
+            connections += pool.num_connections
+        return {
+            'hosts': len(pool_list),
+            'requests': requests_made,
+            'connections_opened': connections,
+            'connections_reused': max(requests_made - connections, 0),
+        }
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> PooledSession:
+    """Process-wide PooledSession built from Config."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = PooledSession(
+                    pool_size=Config.HTTP_POOL_SIZE,
+                    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+                    read_timeout=Config.HTTP_READ_TIMEOUT,
+                    retries=Config.HTTP_RETRIES,
+                    backoff=Config.HTTP_RETRY_BACKOFF,
+                )
+    return _session
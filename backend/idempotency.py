@@ -0,0 +1,60 @@
+from concurrent.futures import Future
+from cache import TTLCache
+import hashlib
+import threading
+
+MAX_KEY_LENGTH = 255
+# 409 bodies for a repeat whose original can't be replayed (yet)
+IN_PROGRESS_ERROR = 'A request with this Idempotency-Key is still in progress; retry later'
+NOT_REPLAYABLE_ERROR = 'The request with this Idempotency-Key returned a response that cannot be replayed; retry it'
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used with a different request body."""
+
+
+class IdempotencyStore:
+    """Bounded, expiring record of Idempotency-Key requests.
+
+    The first request for a key becomes the owner and runs the handler;
+    requests with the same key that arrive while it runs wait on the same
+    Future, later ones get the stored response until the TTL expires.
+    Responses are (status, body, headers). 5xx responses and non-JSON
+    ones (body None) are handed to current waiters but not kept, so a
+    client retry runs again.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 24 * 3600):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        return hashlib.sha256(body or b'').hexdigest()
+
+    def begin(self, key: str, fingerprint: str):
+        """Return (future, is_owner). Raises IdempotencyConflict on a body mismatch."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict('Idempotency-Key was already used with a different request body')
+                self.replays += 1
+                return entry[1], False
+            future = Future()
+            self._entries.set(key, (fingerprint, future))
+            return future, True
+
+    def finish(self, key: str, future: Future, status: int, body, headers: dict = None):
+        if status >= 500 or body is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] is future:
+                    self._entries.pop(key)
+        future.set_result((status, body, headers or {}))
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), 'replays': self.replays, 'conflicts': self.conflicts}
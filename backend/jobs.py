@@ -0,0 +1,276 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from database import Database
+from fal_api import track_fal_requests
+from fal_scheduler import fal_caller, INTERACTIVE
+import asyncio
+import threading
+import traceback
+import uuid
+
+
+INTERRUPTED_MESSAGE = 'Interrupted by a server restart'
+
+
+def new_job_id() -> str:
+    """Job IDs use the same job_<hex> format as the Next.js routes."""
+    return 'job_' + uuid.uuid4().hex[:16]
+
+
+def _fal_request_recorder(db: Database, job_id: str):
+    """on_submit callback that stores a job's fal request id as soon as it is queued."""
+    def record(request_id):
+        try:
+            db.update_job(job_id, fal_request_id=request_id)
+        except Exception:
+            # The job still completes; it just can't be resumed after a crash
+            traceback.print_exc()
+    return record
+
+
+class JobLeases:
+    """This process's claim on the job rows it has queued or is running.
+
+    Rows carry `worker_id` and `lease_expires_at`; held leases are renewed
+    every `ttl / 3` seconds, so recover() in another process only takes
+    over jobs whose owner has stopped renewing them.
+    """
+
+    def __init__(self, db: Database, ttl: float = 90):
+        self.db = db
+        self.ttl = ttl
+        self.worker_id = uuid.uuid4().hex
+        self._held = set()
+        self._lock = threading.Lock()
+
+    @property
+    def renew_interval(self) -> float:
+        return self.ttl / 3
+
+    def expiry(self) -> str:
+        return (datetime.now(timezone.utc) + timedelta(seconds=self.ttl)).isoformat()
+
+    def hold(self, job_id):
+        with self._lock:
+            self._held.add(job_id)
+
+    def release(self, job_id):
+        with self._lock:
+            self._held.discard(job_id)
+
+    def claim(self, job) -> bool:
+        """Take over an unfinished job whose lease has lapsed; False if another process got it first."""
+        if not self.db.claim_job(job['id'], job['status'], self.worker_id, self.expiry()):
+            return False
+        self.hold(job['id'])
+        return True
+
+    def renew(self):
+        with self._lock:
+            job_ids = list(self._held)
+        if job_ids:
+            try:
+                self.db.renew_job_leases(job_ids, self.worker_id, self.expiry())
+            except Exception:
+                traceback.print_exc()
+
+
+class JobRunner:
+    """Runs long-running generations on an in-process thread pool.
+
+    Each job is recorded in the `jobs` table and moves through
+    pending -> processing -> completed/failed. The function's return
+    value is stored as `result_data`. The id of any queued fal request the
+    job makes is stored as `fal_request_id` so recover() can resume it.
+    Rows are leased to this process (see JobLeases) until they finish.
+    """
+
+    def __init__(self, db: Database, max_workers: int = 4, lease_ttl: float = 90):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.leases = JobLeases(db, lease_ttl)
+        self._stopped = threading.Event()
+        threading.Thread(target=self._heartbeat, name='job-leases', daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.leases.renew_interval):
+            self.leases.renew()
+
+    def submit(self, user_id: str, character_id: str, job_type: str,
+               input_data: dict, fn, *args, priority: str = INTERACTIVE, **kwargs) -> str:
+        """Create a pending job row and schedule `fn(*args, **kwargs)`. Returns the job id.
+
+        `priority` is the job's fal scheduling priority: INTERACTIVE for
+        generations a user is waiting on, BATCH for bulk work. It is stored
+        on the row so a recovered job keeps it.
+        """
+        job_id = new_job_id()
+        self.db.create_job({
+            'id': job_id,
+            'user_id': user_id,
+            'character_id': character_id,
+            'job_type': job_type,
+            'status': 'pending',
+            'priority': priority,
+            'input_data': input_data,
+            'worker_id': self.leases.worker_id,
+            'lease_expires_at': self.leases.expiry(),
+        })
+        self.leases.hold(job_id)
+        self.executor.submit(self._run, job_id, user_id, priority, fn, args, kwargs)
+        return job_id
+
+    def recover(self, handlers: dict) -> int:
+        """Take over unfinished jobs of `handlers`' types whose owning process is gone.
+
+        `handlers` maps job_type -> fn(job) that re-runs a job from its row.
+        Only rows whose lease has lapsed are considered, and each is claimed
+        with a conditional update, so concurrent workers never share a job.
+        Pending jobs run from scratch; processing jobs with a fal_request_id
+        poll that request instead of submitting a new one. Processing jobs
+        without one are failed, as their request may have gone out unrecorded.
+        Returns the number of jobs re-queued.
+        """
+        requeued = 0
+        for job in self.db.get_unfinished_jobs(handlers):
+            if not self.leases.claim(job):
+                continue
+            request_id = job.get('fal_request_id')
+            if job['status'] == 'processing' and not request_id:
+                self.db.update_job(job['id'], status='failed', error_message=INTERRUPTED_MESSAGE)
+                self.leases.release(job['id'])
+                continue
+            self.executor.submit(self._run, job['id'], job['user_id'], job.get('priority') or INTERACTIVE,
+                                 handlers[job['job_type']], (job,), {}, request_id)
+            requeued += 1
+        return requeued
+
+    def _run(self, job_id, user_id, priority, fn, args, kwargs, resume_request_id=None):
+        try:
+            if resume_request_id is None:
+                self.db.update_job(job_id, status='processing')
+            with fal_caller(user_id, priority), \
+                    track_fal_requests(_fal_request_recorder(self.db, job_id), resume_request_id):
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                self.db.update_job(job_id, status='failed', error_message=str(e))
+            except Exception:
+                traceback.print_exc()
+            return
+        finally:
+            self.leases.release(job_id)
+
+        try:
+            self.db.update_job(job_id, status='completed', result_data=result, error_message=None)
+        except Exception:
+            traceback.print_exc()
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        self._stopped.set()
+
+
+class AsyncJobRunner:
+    """JobRunner for the asyncio app: jobs are coroutines run as tasks on the event loop.
+
+    Same `jobs` table lifecycle as JobRunner. At most `max_concurrency`
+    jobs run at once; the rest stay pending until a slot frees up.
+    """
+
+    def __init__(self, db: Database, max_concurrency: int = 500, lease_ttl: float = 90):
+        self.db = db
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self.leases = JobLeases(db, lease_ttl)
+        self._heartbeat_task = None
+
+    def _ensure_heartbeat(self):
+        # Started lazily: the runner is built at import time, before the event loop exists
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat(), name='job-leases')
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.leases.renew_interval)
+            await asyncio.to_thread(self.leases.renew)
+
+    async def submit(self, user_id: str, character_id: str, job_type: str,
+                     input_data: dict, fn, *args, priority: str = INTERACTIVE, **kwargs) -> str:
+        """Create a pending job row and schedule `await fn(*args, **kwargs)`. Returns the job id."""
+        job_id = new_job_id()
+        await asyncio.to_thread(self.db.create_job, {
+            'id': job_id,
+            'user_id': user_id,
+            'character_id': character_id,
+            'job_type': job_type,
+            'status': 'pending',
+            'priority': priority,
+            'input_data': input_data,
+            'worker_id': self.leases.worker_id,
+            'lease_expires_at': self.leases.expiry(),
+        })
+        self.leases.hold(job_id)
+        self._spawn(job_id, user_id, priority, fn, args, kwargs)
+        return job_id
+
+    async def recover(self, handlers: dict) -> int:
+        """JobRunner.recover with coroutine handlers."""
+        requeued = 0
+        for job in await asyncio.to_thread(self.db.get_unfinished_jobs, handlers):
+            if not await asyncio.to_thread(self.leases.claim, job):
+                continue
+            request_id = job.get('fal_request_id')
+            if job['status'] == 'processing' and not request_id:
+                await asyncio.to_thread(self.db.update_job, job['id'], status='failed',
+                                        error_message=INTERRUPTED_MESSAGE)
+                self.leases.release(job['id'])
+                continue
+            self._spawn(job['id'], job['user_id'], job.get('priority') or INTERACTIVE,
+                        handlers[job['job_type']], (job,), {}, request_id)
+            requeued += 1
+        return requeued
+
+    def _spawn(self, job_id, user_id, priority, fn, args, kwargs, resume_request_id=None):
+        self._ensure_heartbeat()
+        task = asyncio.create_task(self._run(job_id, user_id, priority, fn, args, kwargs, resume_request_id),
+                                   name=job_id)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id, user_id, priority, fn, args, kwargs, resume_request_id=None):
+        async with self._slots:
+            try:
+                if resume_request_id is None:
+                    await asyncio.to_thread(self.db.update_job, job_id, status='processing')
+                with fal_caller(user_id, priority), \
+                        track_fal_requests(_fal_request_recorder(self.db, job_id), resume_request_id):
+                    result = await fn(*args, **kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                try:
+                    await asyncio.to_thread(self.db.update_job, job_id, status='failed', error_message=str(e))
+                except Exception:
+                    traceback.print_exc()
+                return
+            finally:
+                self.leases.release(job_id)
+
+            try:
+                await asyncio.to_thread(self.db.update_job, job_id, status='completed',
+                                        result_data=result, error_message=None)
+            except Exception:
+                traceback.print_exc()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def shutdown(self, wait: bool = True):
+        if not wait:
+            for task in self._tasks:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
@@ -0,0 +1,79 @@
+import json
+
+_WHITESPACE = ' \t\r\n'
+
+
+class JsonFieldStream:
+    """Incremental parser for a streamed top-level JSON object.
+
+    Feed text chunks as they arrive; `feed` returns the (key, value)
+    pairs whose values became complete in that chunk. Anything before
+    the first '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = None  # index just after the last consumed token; None until '{' is seen
+        self.finished = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        if self.finished:
+            return []
+        if self.pos is None:
+            start = self.buffer.find('{')
+            if start < 0:
+                return []
+            self.pos = start + 1
+
+        fields = []
+        while True:
+            field = self._next_field()
+            if field is None:
+                break
+            fields.append(field)
+        return fields
+
+    def _skip(self, pos):
+        while pos < len(self.buffer) and self.buffer[pos] in _WHITESPACE + ',':
+            pos += 1
+        return pos
+
+    def _next_field(self):
+        buf = self.buffer
+        pos = self._skip(self.pos)
+        if pos >= len(buf):
+            return None
+        if buf[pos] == '}':
+            self.finished = True
+            self.pos = pos + 1
+            return None
+
+        try:
+            key, pos = self._decoder.raw_decode(buf, pos)
+        except ValueError:
+            return None
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            return None
+        if buf[pos] != ':':
+            self.finished = True  # not an object we understand; stop emitting
+            return None
+        pos += 1
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            return None
+
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except ValueError:
+            return None
+        # Numbers and literals may still be growing ("1" of "12"); wait for a delimiter
+        if buf[pos] not in '"[{' and end >= len(buf):
+            return None
+
+        self.pos = end
+        return key, value
@@ -0,0 +1,68 @@
+from cache import TTLCache
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class ResponseCache:
+    """Cache of chat completion text keyed by (model, messages, temperature).
+
+    An in-memory LRU sits in front of an optional on-disk store with one
+    JSON file per key. TTLs are chosen per call by the client.
+    """
+
+    def __init__(self, store_dir: str = None, maxsize: int = 1024):
+        self.memory = TTLCache(maxsize=maxsize, ttl=0)
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float) -> str:
+        payload = json.dumps({'model': model, 'messages': messages, 'temperature': temperature},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        content = self.memory.get(key)
+        if content is not None:
+            return content
+
+        if self.store_dir:
+            path = self.store_dir / f"{key}.json"
+            try:
+                entry = json.loads(path.read_text())
+            except (OSError, ValueError):
+                entry = None
+            if entry:
+                remaining = entry['expires_at'] - time.time()
+                if remaining > 0:
+                    self.disk_hits += 1
+                    self.memory.set(key, entry['content'], ttl=remaining)
+                    return entry['content']
+                path.unlink(missing_ok=True)
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, content: str, ttl: float):
+        if ttl <= 0:
+            return
+        self.memory.set(key, content, ttl=ttl)
+        if self.store_dir:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.store_dir), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'expires_at': time.time() + ttl, 'content': content}, f)
+            os.replace(tmp_path, self.store_dir / f"{key}.json")
+
+    def stats(self) -> dict:
+        return {
+            'memory_hits': self.memory.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'memory_size': len(self.memory),
+        }
@@ -0,0 +1,29 @@
+from flask import abort, send_from_directory
+from werkzeug.security import safe_join
+import hashlib
+import os
+
+# Media filenames are unique per generation and never rewritten (MediaService
+# included), so responses can be cached forever
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def send_media(directory: str, filename: str, as_attachment: bool = False):
+    """send_from_directory with immutable caching, strong ETags, 304s and byte ranges.
+
+    The ETag is derived from the filename and size rather than mtime so
+    it is identical across processes and hosts serving the same file.
+    Werkzeug's conditional handling answers If-None-Match with 304 and
+    Range with 206 (416 for unsatisfiable ranges).
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    size = os.path.getsize(path)
+    etag = hashlib.sha256(f"{filename}:{size}".encode()).hexdigest()[:32]
+
+    response = send_from_directory(directory, filename, as_attachment=as_attachment,
+                                   conditional=True, etag=etag, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
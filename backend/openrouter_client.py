@@ -1,14 +1,105 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from llm_cache import ResponseCache
+from json_stream import JsonFieldStream
+from resilience import get_resilience
+import asyncio
 import json
 import re
 
+# Response cache TTL (seconds) per method; 0 = never cached
+CACHE_TTLS = {
+    'generate_character_personality': 0,
+    'generate_content_plan': 24 * 3600,
+    'generate_video_prompt': 24 * 3600,
+    'determine_video_duration': 30 * 24 * 3600,
+}
+
+
+def _cacheable(content: str, validate) -> bool:
+    """Whether `content` passes `validate` (a parser that raises ValueError on bad replies)."""
+    if content is None:
+        return False
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except ValueError:
+        return False
+    return True
+
+
 class OpenRouterClient:
-    def __init__(self, api_key: str, model: str):
+    def __init__(self, api_key: str, model: str, cache: ResponseCache = None):
+        # Retries are handled by the shared resilience layer, not the SDK
         self.client = OpenAI(
             base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0
         )
         self.model = model
+        self.cache = cache
+        self.resilience = get_resilience()
+
+    def _complete(self, method: str, messages: list, temperature: float, use_cache: bool = True,
+                  validate=None) -> str:
+        """Run a chat completion and return the message text.
+
+        With a cache configured, identical (model, messages, temperature)
+        requests are served from it for CACHE_TTLS[method] seconds.
+        Pass use_cache=False when a fresh, different answer is wanted.
+        A reply is only cached if `validate(content)` doesn't raise
+        ValueError, so a malformed answer isn't replayed.
+        """
+        ttl = CACHE_TTLS.get(method, 0)
+        key = None
+        if self.cache and use_cache and ttl > 0:
+            key = ResponseCache.make_key(self.model, messages, temperature)
+            content = self.cache.get(key)
+            if content is not None:
+                return content
+
+        response = self.resilience.call(
+            f"openrouter:{self.model}",
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=messages,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+
+        if key and _cacheable(content, validate):
+            self.cache.set(key, content, ttl)
+        return content
+
+    def _stream(self, method: str, messages: list, temperature: float, validate=None):
+        """Stream a chat completion, yielding text deltas.
+
+        Always hits the API; the full text is written to the cache (if
+        any, and if it passes `validate`) afterwards so a later
+        non-streaming call can reuse it.
+        """
+        # Only opening the stream is retried; a failure mid-stream propagates
+        stream = self.resilience.call(
+            f"openrouter:{self.model}",
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        ttl = CACHE_TTLS.get(method, 0)
+        content = ''.join(parts)
+        if self.cache and ttl > 0 and _cacheable(content, validate):
+            self.cache.set(ResponseCache.make_key(self.model, messages, temperature), content, ttl)
 
     def _extract_json(self, content: str) -> dict:
         """Extract JSON from response, handling markdown code blocks"""
@@ -17,8 +108,7 @@ class OpenRouterClient:
             content = json_match.group(1)
         return json.loads(content)
 
-    def generate_character_personality(self, concept: str, audience: str) -> dict:
-        """Generate personality traits for a character"""
+    def _personality_messages(self, concept: str, audience: str) -> list:
         prompt = f"""Create a detailed personality profile for an AI influencer character.
 
 Concept: {concept}
@@ -34,19 +124,23 @@ Generate a JSON object with:
 
 Return only valid JSON."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are a character design expert. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8
+        return [
+            {"role": "system", "content": "You are a character design expert. Always return valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_character_personality(self, concept: str, audience: str, use_cache: bool = True) -> dict:
+        """Generate personality traits for a character"""
+        content = self._complete(
+            'generate_character_personality',
+            self._personality_messages(concept, audience),
+            temperature=0.8,
+            use_cache=use_cache,
         )
 
-        return self._extract_json(response.choices[0].message.content)
+        return self._extract_json(content)
 
-    def generate_content_plan(self, character: dict, theme: str) -> dict:
-        """Generate a single-video content plan (no scenes) - legacy"""
+    def _content_plan_messages(self, character: dict, theme: str) -> list:
         prompt = f"""Create a SHORT-FORM VIDEO content plan for this character:
 
 Character: {character['name']}
@@ -70,19 +164,38 @@ Generate a JSON object with EXACTLY these fields:
 DO NOT include "scenes" - this is a SINGLE video with one continuous flow.
 Return only valid JSON."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are a content strategist specializing in short-form video. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
+        return [
+            {"role": "system", "content": "You are a content strategist specializing in short-form video. Always return valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_content_plan(self, character: dict, theme: str, use_cache: bool = True) -> dict:
+        """Generate a single-video content plan (no scenes) - legacy"""
+        content = self._complete(
+            'generate_content_plan',
+            self._content_plan_messages(character, theme),
+            temperature=0.7,
+            use_cache=use_cache,
+            validate=self._extract_json,
         )
 
-        return self._extract_json(response.choices[0].message.content)
+        return self._extract_json(content)
 
-    def generate_video_prompt(self, character: dict, concept: str) -> str:
-        """Generate a video prompt from character info and concept."""
+    def stream_content_plan(self, character: dict, theme: str):
+        """Stream a content plan, yielding (field, value) as each top-level field completes.
+
+        The final item is ('done', plan_dict).
+        """
+        parser = JsonFieldStream()
+        content = ''
+        for delta in self._stream('generate_content_plan', self._content_plan_messages(character, theme),
+                                  temperature=0.7, validate=self._extract_json):
+            content += delta
+            for field, value in parser.feed(delta):
+                yield field, value
+        yield 'done', self._extract_json(content)
+
+    def _video_prompt_messages(self, character: dict, concept: str) -> list:
         prompt = f"""Create a detailed second-by-second video prompt for a short-form video.
 
 Character: {character['name']}
@@ -97,19 +210,28 @@ The video can be 5-15 seconds long.
 Format: "0-2s: [action], 2-5s: [action], ..."
 Return ONLY the video prompt text, no JSON, no markdown."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are a video director specializing in short-form content. Return only the prompt text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
+        return [
+            {"role": "system", "content": "You are a video director specializing in short-form content. Return only the prompt text."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_video_prompt(self, character: dict, concept: str, use_cache: bool = True) -> str:
+        """Generate a video prompt from character info and concept."""
+        content = self._complete(
+            'generate_video_prompt',
+            self._video_prompt_messages(character, concept),
+            temperature=0.7,
+            use_cache=use_cache,
         )
 
-        return response.choices[0].message.content.strip()
+        return content.strip()
 
-    def determine_video_duration(self, video_prompt: str) -> int:
-        """Analyze a video prompt and determine optimal duration (5-15 seconds)."""
+    def stream_video_prompt(self, character: dict, concept: str):
+        """Stream a video prompt, yielding text deltas as they arrive."""
+        yield from self._stream('generate_video_prompt', self._video_prompt_messages(character, concept),
+                                temperature=0.7)
+
+    def _duration_messages(self, video_prompt: str) -> list:
         prompt = f"""Analyze this video prompt and determine the optimal duration in seconds (5-15).
 
 Video prompt:
@@ -122,18 +244,131 @@ Rules:
 
 Return ONLY a single integer (5-15), nothing else."""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "Return only a single integer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
+        return [
+            {"role": "system", "content": "Return only a single integer."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _strict_duration(content: str) -> int:
+        return int(content.strip())
 
-        raw = response.choices[0].message.content.strip()
+    @staticmethod
+    def _parse_duration(content: str) -> int:
         try:
-            duration = int(raw)
+            duration = int(content.strip())
             return max(5, min(15, duration))
         except ValueError:
             return 10
+
+    def determine_video_duration(self, video_prompt: str, use_cache: bool = True) -> int:
+        """Analyze a video prompt and determine optimal duration (5-15 seconds)."""
+        content = self._complete(
+            'determine_video_duration',
+            self._duration_messages(video_prompt),
+            temperature=0.3,
+            use_cache=use_cache,
+            validate=self._strict_duration,
+        )
+
+        return self._parse_duration(content)
+
+
+class AsyncOpenRouterClient(OpenRouterClient):
+    """asyncio counterpart of OpenRouterClient built on AsyncOpenAI.
+
+    Prompts, parsing and the response cache are shared with the sync
+    client; the generate methods are coroutines.
+    """
+
+    def __init__(self, api_key: str, model: str, cache: ResponseCache = None):
+        self.client = AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=api_key,
+            max_retries=0
+        )
+        self.model = model
+        self.cache = cache
+        self.resilience = get_resilience()
+
+    async def _complete(self, method: str, messages: list, temperature: float, use_cache: bool = True,
+                        validate=None) -> str:
+        ttl = CACHE_TTLS.get(method, 0)
+        key = None
+        if self.cache and use_cache and ttl > 0:
+            key = ResponseCache.make_key(self.model, messages, temperature)
+            content = await asyncio.to_thread(self.cache.get, key)
+            if content is not None:
+                return content
+
+        response = await self.resilience.acall(
+            f"openrouter:{self.model}",
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=messages,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content
+
+        if key and _cacheable(content, validate):
+            await asyncio.to_thread(self.cache.set, key, content, ttl)
+        return content
+
+    async def _stream(self, method: str, messages: list, temperature: float, validate=None):
+        stream = await self.resilience.acall(
+            f"openrouter:{self.model}",
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        ttl = CACHE_TTLS.get(method, 0)
+        content = ''.join(parts)
+        if self.cache and ttl > 0 and _cacheable(content, validate):
+            key = ResponseCache.make_key(self.model, messages, temperature)
+            await asyncio.to_thread(self.cache.set, key, content, ttl)
+
+    async def generate_character_personality(self, concept: str, audience: str, use_cache: bool = True) -> dict:
+        content = await self._complete('generate_character_personality', self._personality_messages(concept, audience),
+                                       temperature=0.8, use_cache=use_cache)
+        return self._extract_json(content)
+
+    async def generate_content_plan(self, character: dict, theme: str, use_cache: bool = True) -> dict:
+        content = await self._complete('generate_content_plan', self._content_plan_messages(character, theme),
+                                       temperature=0.7, use_cache=use_cache, validate=self._extract_json)
+        return self._extract_json(content)
+
+    async def stream_content_plan(self, character: dict, theme: str):
+        parser = JsonFieldStream()
+        content = ''
+        async for delta in self._stream('generate_content_plan', self._content_plan_messages(character, theme),
+                                        temperature=0.7, validate=self._extract_json):
+            content += delta
+            for field, value in parser.feed(delta):
+                yield field, value
+        yield 'done', self._extract_json(content)
+
+    async def generate_video_prompt(self, character: dict, concept: str, use_cache: bool = True) -> str:
+        content = await self._complete('generate_video_prompt', self._video_prompt_messages(character, concept),
+                                       temperature=0.7, use_cache=use_cache)
+        return content.strip()
+
+    async def stream_video_prompt(self, character: dict, concept: str):
+        async for delta in self._stream('generate_video_prompt', self._video_prompt_messages(character, concept),
+                                        temperature=0.7):
+            yield delta
+
+    async def determine_video_duration(self, video_prompt: str, use_cache: bool = True) -> int:
+        content = await self._complete('determine_video_duration', self._duration_messages(video_prompt),
+                                       temperature=0.3, use_cache=use_cache, validate=self._strict_duration)
+        return self._parse_duration(content)
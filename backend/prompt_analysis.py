@@ -0,0 +1,76 @@
+import math
+import re
+
+MIN_VIDEO_DURATION = 5
+MAX_VIDEO_DURATION = 15
+# Fewer segments than this is more likely a stray "3-4s:" in free text than a timeline
+MIN_TIMELINE_SEGMENTS = 2
+
+# "0-2s: ...", "2s-5s: ...", "5 – 8 sec: ...", "8 to 10 seconds: ..."
+_SEGMENT_RE = re.compile(
+    r'(?<![\w.])(\d+(?:\.\d+)?)\s*s?\s*(?:-|–|—|~|to)\s*(\d+(?:\.\d+)?)\s*(?:s|sec|secs|seconds?)\b\s*:',
+    re.IGNORECASE,
+)
+
+
+def parse_timeline(video_prompt: str) -> list[dict]:
+    """Split a timestamped prompt into [{'start', 'end', 'text'}, ...] in order of appearance."""
+    matches = list(_SEGMENT_RE.finditer(video_prompt or ''))
+    segments = []
+    for i, m in enumerate(matches):
+        text_end = matches[i + 1].start() if i + 1 < len(matches) else len(video_prompt)
+        segments.append({
+            'start': float(m.group(1)),
+            'end': float(m.group(2)),
+            'text': video_prompt[m.end():text_end].strip(' ,;\n'),
+        })
+    return segments
+
+
+def analyze_timeline(video_prompt: str) -> dict:
+    """Validate a prompt's segment timeline and derive the video duration from it.
+
+    Returns:
+        {'segments': [...], 'issues': [...], 'valid': bool, 'duration': int | None}
+
+    The timeline is valid when it has at least two segments, the first
+    starts at 0s, and every segment has a positive length and starts no
+    earlier than the previous one ends. Gaps between segments and
+    out-of-range totals are reported as issues but do not invalidate it;
+    the duration is the last segment's end, rounded up and clamped to 5-15s.
+    """
+    segments = parse_timeline(video_prompt)
+    issues = []
+    valid = len(segments) >= MIN_TIMELINE_SEGMENTS
+    if segments and len(segments) < MIN_TIMELINE_SEGMENTS:
+        issues.append(f"only {len(segments)} timestamped segment; need at least {MIN_TIMELINE_SEGMENTS}")
+    if segments and segments[0]['start'] != 0:
+        issues.append(f"timeline starts at {segments[0]['start']:g}s, not 0s")
+        valid = False
+
+    prev_end = segments[0]['start'] if segments else 0.0
+    for i, seg in enumerate(segments):
+        label = f"{seg['start']:g}-{seg['end']:g}s"
+        if seg['end'] <= seg['start']:
+            issues.append(f"segment {label} has non-positive length")
+            valid = False
+        if seg['start'] < prev_end:
+            issues.append(f"segment {label} overlaps previous segment ending at {prev_end:g}s")
+            valid = False
+        elif seg['start'] > prev_end:
+            issues.append(f"gap between {prev_end:g}s and {seg['start']:g}s")
+        prev_end = max(prev_end, seg['end'])
+
+    duration = None
+    if valid:
+        total = math.ceil(prev_end)
+        duration = max(MIN_VIDEO_DURATION, min(MAX_VIDEO_DURATION, total))
+        if duration != total:
+            issues.append(f"timeline length {prev_end:g}s clamped to {duration}s")
+
+    return {
+        'segments': segments,
+        'issues': issues,
+        'valid': valid,
+        'duration': duration,
+    }
@@ -0,0 +1,236 @@
+from config import Config
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
+import httpx
+import openai
+import random
+import requests
+import threading
+import time
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Network-level failures worth another attempt (timeouts, resets, refused connections)
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    openai.APIConnectionError,
+)
+
+
+class CircuitOpenError(Exception):
+    """The endpoint's circuit breaker is open; the call was not attempted."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"{endpoint} is temporarily unavailable, retry in {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def _status_code(exc):
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc):
+    """Seconds from a Retry-After (or retry-after-ms) header on the error's response, if any."""
+    headers = getattr(exc, 'response_headers', None)
+    if headers is None:
+        headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in headers.items()}
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc) -> bool:
+    """429, 408/425 and 5xx responses and transport errors; other 4xx (validation, auth) are final."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed/open."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self, now: float) -> float:
+        """0 if a call may go ahead, else seconds until the next probe. Caller holds the lock."""
+        if self.state == 'open':
+            remaining = self.opened_at + self.reset_timeout - now
+            if remaining > 0:
+                return remaining
+            self.state = 'half_open'
+        if self.state == 'half_open':
+            if self._probing:
+                return self.reset_timeout
+            self._probing = True
+        return 0
+
+    def record(self, success: bool, now: float):
+        self._probing = False
+        if success:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.times_opened += 1
+            self.state = 'open'
+            self.opened_at = now
+
+
+class Resilience:
+    """Retries with jittered exponential backoff plus a circuit breaker per endpoint.
+
+    Only transient failures (see is_retryable) are retried and count
+    against the breaker. A Retry-After longer than `max_delay` ends the
+    retries rather than blocking the caller for that long.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, endpoint: str):
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._counters[endpoint] = {'calls': 0, 'retries': 0, 'failures': 0, 'short_circuits': 0}
+        return breaker, self._counters[endpoint]
+
+    def _before(self, endpoint: str):
+        with self._lock:
+            breaker, counters = self._entry(endpoint)
+            wait = breaker.allow(time.monotonic())
+            if wait:
+                counters['short_circuits'] += 1
+                raise CircuitOpenError(endpoint, wait)
+            counters['calls'] += 1
+
+    def _abandon(self, endpoint: str):
+        """A cancelled attempt records nothing, but must free a half-open probe slot."""
+        with self._lock:
+            self._breakers[endpoint]._probing = False
+
+    def _after(self, endpoint: str, exc, attempt: int):
+        """Record an attempt's outcome; returns the delay before retrying, or None to stop."""
+        transient = exc is not None and is_retryable(exc)
+        with self._lock:
+            breaker, counters = self._entry(endpoint)
+            if exc is None or not transient:
+                # Success, or a caller error the provider handled fine
+                breaker.record(True, time.monotonic())
+                return None
+            breaker.record(False, time.monotonic())
+            counters['failures'] += 1
+            if attempt >= self.max_attempts or breaker.state == 'open':
+                return None
+            delay = retry_after(exc)
+            if delay is None:
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+            elif delay > self.max_delay:
+                return None
+            counters['retries'] += 1
+            return delay
+
+    def call(self, endpoint: str, fn, *args, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            self._before(endpoint)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._after(endpoint, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._abandon(endpoint)
+                raise
+            self._after(endpoint, None, attempt)
+            return result
+
+    async def acall(self, endpoint: str, fn, *args, **kwargs):
+        """Async version of call(); `fn` returns an awaitable."""
+        for attempt in range(1, self.max_attempts + 1):
+            self._before(endpoint)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._after(endpoint, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._abandon(endpoint)
+                raise
+            self._after(endpoint, None, attempt)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    'state': breaker.state,
+                    'consecutive_failures': breaker.consecutive_failures,
+                    'times_opened': breaker.times_opened,
+                    **self._counters[endpoint],
+                }
+                for endpoint, breaker in self._breakers.items()
+            }
+
+
+_resilience = None
+_resilience_lock = threading.Lock()
+
+
+def get_resilience() -> Resilience:
+    """Process-wide Resilience shared by the fal and OpenRouter clients."""
+    global _resilience
+    if _resilience is None:
+        with _resilience_lock:
+            if _resilience is None:
+                _resilience = Resilience(
+                    max_attempts=Config.RETRY_MAX_ATTEMPTS,
+                    base_delay=Config.RETRY_BASE_DELAY,
+                    max_delay=Config.RETRY_MAX_DELAY,
+                    failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout=Config.BREAKER_RESET_TIMEOUT,
+                )
+    return _resilience
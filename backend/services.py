@@ -1,11 +1,30 @@
 from config import Config
-from fal_api import FalClient
-from openrouter_client import OpenRouterClient
+from fal_api import AsyncFalClient, FalClient
+from openrouter_client import AsyncOpenRouterClient, OpenRouterClient
 from database import Database
+from file_cleanup import get_cleanup_worker
+from prompt_analysis import analyze_timeline
+from thumbnails import get_thumbnail_worker
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import uuid
 
+
+class PrepareVideoError(Exception):
+    """One or more prepare_video stages failed.
+
+    `stages` maps stage name -> error message; `partial` holds whatever
+    the successful stages produced.
+    """
+
+    def __init__(self, stages: dict, partial: dict):
+        super().__init__('; '.join(f"{stage}: {msg}" for stage, msg in stages.items()))
+        self.stages = stages
+        self.partial = partial
+
 class CharacterService:
     def __init__(self, fal_client: FalClient, llm_client: OpenRouterClient, db: Database):
         self.fal_client = fal_client
@@ -72,17 +91,9 @@ class CharacterService:
         return self.db.get_character(character_id)
 
     def delete_character(self, character_id: str):
-        """Delete character and clean up related media files from disk."""
+        """Delete character; related media files are removed from disk in the background."""
         file_paths = self.db.delete_character(character_id)
-
-        # Delete actual files from disk
-        for web_path in file_paths:
-            if web_path and web_path.startswith('/media/'):
-                local_path = Config.DATA_DIR / web_path[1:]
-                try:
-                    Path(local_path).unlink(missing_ok=True)
-                except Exception:
-                    pass
+        get_cleanup_worker().enqueue(file_paths)
 
 
 class ContentService:
@@ -91,14 +102,55 @@ class ContentService:
         self.llm_client = llm_client
         self.db = db
 
-    def create_content_plan(self, character: dict, theme: str):
+    def create_content_plan(self, character: dict, theme: str, use_cache: bool = True):
         """Generate single-video content plan"""
         plan_data = self.llm_client.generate_content_plan(
             character=character,
-            theme=theme
+            theme=theme,
+            use_cache=use_cache
         )
 
-        plan = {
+        plan = self._build_plan(character, theme, plan_data)
+        self.db.save_content_plan(plan)
+        return plan
+
+    def create_content_plans(self, character: dict, themes: list, max_concurrency: int = 4,
+                             use_cache: bool = True) -> list:
+        """Generate plans for several themes concurrently and save them in one upsert.
+
+        Returns one entry per theme, in order: {'theme', 'plan'} on success
+        or {'theme', 'error'} on failure.
+        """
+        def generate(theme):
+            plan_data = self.llm_client.generate_content_plan(character=character, theme=theme,
+                                                              use_cache=use_cache)
+            return self._build_plan(character, theme, plan_data)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(themes)))) as executor:
+            futures = [executor.submit(generate, theme) for theme in themes]
+            for theme, future in zip(themes, futures):
+                try:
+                    results.append({'theme': theme, 'plan': future.result()})
+                except Exception as e:
+                    results.append({'theme': theme, 'error': str(e)})
+
+        self.db.save_content_plans([r['plan'] for r in results if 'plan' in r])
+        return results
+
+    def stream_content_plan(self, character: dict, theme: str):
+        """Like create_content_plan, but yields ('field', (name, value)) as the
+        LLM output streams in, then ('plan', plan) once it is saved."""
+        for field, value in self.llm_client.stream_content_plan(character, theme):
+            if field == 'done':
+                plan = self._build_plan(character, theme, value)
+                self.db.save_content_plan(plan)
+                yield 'plan', plan
+            else:
+                yield 'field', (field, value)
+
+    def _build_plan(self, character: dict, theme: str, plan_data: dict) -> dict:
+        return {
             'id': str(uuid.uuid4()),
             'character_id': character['id'],
             'title': plan_data['title'],
@@ -112,9 +164,6 @@ class ContentService:
             'created_at': datetime.now().isoformat()
         }
 
-        self.db.save_content_plan(plan)
-        return plan
-
     def get_content_plans(self, character_id=None):
         return self.db.get_content_plans(character_id)
 
@@ -141,7 +190,8 @@ class MediaService:
         plan_id = plan['id']
         first_frame_prompt = plan['first_frame_prompt']
 
-        filename = f"{plan_id}_first_frame.png"
+        # Unique per generation: media is served immutable, so files must never be rewritten
+        filename = f"{plan_id}_{uuid.uuid4().hex[:8]}_first_frame.png"
         save_path = Config.IMAGES_DIR / filename
 
         if generation_option == 'ref_image':
@@ -177,6 +227,7 @@ class MediaService:
 
         file_url = f"/media/images/{filename}"
         self.db.save_media(plan_id, 'image', file_url)
+        get_thumbnail_worker().enqueue(file_url)
         return file_url
 
     def generate_video(self, plan: dict, character, generation_option: str = 'ref_image', reference_image_path: str = None) -> dict:
@@ -185,7 +236,7 @@ class MediaService:
         first_frame_url = self.generate_image(plan, character, generation_option, reference_image_path)
         first_frame_local = str(Config.DATA_DIR / first_frame_url[1:])
 
-        video_filename = f"{plan_id}_video.mp4"
+        video_filename = f"{plan_id}_{uuid.uuid4().hex[:8]}_video.mp4"
         video_save_path = Config.VIDEOS_DIR / video_filename
 
         self.fal_client.generate_video(
@@ -197,6 +248,7 @@ class MediaService:
 
         video_url = f"/media/videos/{video_filename}"
         self.db.save_media(plan_id, 'video', video_url)
+        get_thumbnail_worker().enqueue(video_url, first_frame_url)
 
         return {
             'first_frame_path': first_frame_url,
@@ -233,6 +285,7 @@ class GenerateService:
         self.fal_client = fal_client
         self.llm_client = llm_client
         self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=Config.GENERATE_WORKERS, thread_name_prefix='generate')
 
     def _get_local_path(self, web_path: str) -> str:
         """Convert /media/... web path to local filesystem path"""
@@ -247,8 +300,72 @@ class GenerateService:
             raise ValueError("Character has no ID photo")
         return self._get_local_path(img)
 
+    def _image_paths(self, character: dict, option: str, reference_image_path: str = None) -> list:
+        image_paths = [self._get_character_image_local(character)]
+        if option == 'ref_image' and reference_image_path:
+            ref_local = self._get_local_path(reference_image_path)
+            if ref_local:
+                image_paths.append(ref_local)
+        return image_paths
+
+    def _reusable_media(self, character_id: str, input_hash: str):
+        """Earlier media row generated from the same inputs whose file is still on disk."""
+        row = self.db.find_media_by_input_hash(character_id, input_hash)
+        if row and row.get('file_path') and Path(self._get_local_path(row['file_path'])).exists():
+            return row
+        return None
+
+    def _batch_input_hashes(self, prompts: list, variants: int, image_paths: list) -> list:
+        """input_hash of each prompt's batch request (all variants of a prompt share it)."""
+        return [
+            self.fal_client.request_fingerprint(FalClient._scene_request(prompt, image_paths, variants), image_paths)
+            for prompt in prompts
+        ]
+
+    def _reusable_batch(self, character_id: str, input_hashes: list, variants: int) -> dict:
+        """input_hash -> `variants` earlier media rows from the same inputs whose files are still on disk."""
+        reusable = {}
+        for input_hash, rows in self.db.find_media_by_input_hashes(character_id, set(input_hashes)).items():
+            rows = [row for row in rows
+                    if row.get('file_path') and Path(self._get_local_path(row['file_path'])).exists()]
+            if len(rows) >= variants:
+                reusable[input_hash] = rows[:variants]
+        return reusable
+
+    @staticmethod
+    def _batch_rows(character: dict, option: str, reference_image_path: str, prompts: list,
+                    input_hashes: list, outcomes: list) -> list:
+        """Media rows for the generated prompts; `outcomes` holds file paths, an exception or None (reused)."""
+        return [
+            {
+                'character_id': character['id'],
+                'media_type': 'image',
+                'file_path': file_url,
+                'generation_mode': option,
+                'prompt': prompt,
+                'reference_image_path': reference_image_path,
+                'input_hash': input_hash,
+            }
+            for prompt, input_hash, outcome in zip(prompts, input_hashes, outcomes) if isinstance(outcome, list)
+            for file_url in outcome
+        ]
+
+    @staticmethod
+    def _batch_results(prompts: list, input_hashes: list, outcomes: list, reused: dict, media_ids) -> list:
+        results = []
+        for prompt, input_hash, outcome in zip(prompts, input_hashes, outcomes):
+            if outcome is None:
+                results.append({'prompt': prompt, 'reused': True, 'items': [
+                    {'media_id': row['id'], 'file_path': row['file_path']} for row in reused[input_hash]]})
+            elif isinstance(outcome, Exception):
+                results.append({'prompt': prompt, 'error': str(outcome)})
+            else:
+                results.append({'prompt': prompt, 'items': [
+                    {'media_id': next(media_ids), 'file_path': f} for f in outcome]})
+        return results
+
     def generate_image(self, character: dict, prompt: str, option: str,
-                       reference_image_path: str = None) -> dict:
+                       reference_image_path: str = None, reuse: bool = False) -> dict:
         """Generate an image directly (no Plan needed).
 
         Args:
@@ -256,33 +373,25 @@ class GenerateService:
             prompt: User prompt
             option: 'ref_image' or 'text_only'
             reference_image_path: Web path to uploaded reference image (optional)
+            reuse: Return the existing media for identical inputs instead of generating
         """
-        char_local = self._get_character_image_local(character)
+        # Character ID photo always, plus the reference image for 'ref_image'
+        image_paths = self._image_paths(character, option, reference_image_path)
+        input_hash = self.fal_client.request_fingerprint(FalClient._scene_request(prompt, image_paths, 1), image_paths)
+        if reuse:
+            existing = self._reusable_media(character['id'], input_hash)
+            if existing:
+                return {'media_id': existing['id'], 'file_path': existing['file_path'], 'reused': True}
+
         gen_id = uuid.uuid4().hex[:12]
         filename = f"gen_{gen_id}.png"
         save_path = Config.IMAGES_DIR / filename
 
-        if option == 'ref_image':
-            # Always include character ID photo
-            image_paths = [char_local]
-            # Add optional reference image
-            if reference_image_path:
-                ref_local = self._get_local_path(reference_image_path)
-                if ref_local:
-                    image_paths.append(ref_local)
-
-            self.fal_client.generate_scene_image_from_character(
-                prompt=prompt,
-                image_paths=image_paths,
-                save_path=str(save_path)
-            )
-        else:
-            # text_only: still use character ID photo for consistency
-            self.fal_client.generate_scene_image_from_character(
-                prompt=prompt,
-                image_paths=[char_local],
-                save_path=str(save_path)
-            )
+        self.fal_client.generate_scene_image_from_character(
+            prompt=prompt,
+            image_paths=image_paths,
+            save_path=str(save_path)
+        )
 
         file_url = f"/media/images/{filename}"
         media_id = self.db.save_media_v2(
@@ -292,57 +401,129 @@ class GenerateService:
             generation_mode=option,
             prompt=prompt,
             reference_image_path=reference_image_path,
+            input_hash=input_hash,
         )
+        get_thumbnail_worker().enqueue(file_url)
 
         return {'media_id': media_id, 'file_path': file_url}
 
+    def generate_images(self, character: dict, prompts: list, variants: int, option: str,
+                        reference_image_path: str = None, max_concurrency: int = 4, reuse: bool = False) -> list:
+        """Generate `variants` images for each prompt in one go.
+
+        Reference images are uploaded once, the per-prompt fal requests run
+        concurrently (at most `max_concurrency` at a time) and all media rows
+        are written with one bulk insert. Each row stores its prompt's
+        input_hash; with `reuse`, a prompt that already has `variants`
+        images from identical inputs returns those instead of generating.
+
+        Returns one entry per prompt, in order: {'prompt', 'items': [{'media_id', 'file_path'}]}
+        (with 'reused': True for reused ones) or {'prompt', 'error'}.
+        """
+        image_paths = self._image_paths(character, option, reference_image_path)
+        input_hashes = self._batch_input_hashes(prompts, variants, image_paths)
+        reused = self._reusable_batch(character['id'], input_hashes, variants) if reuse else {}
+        pending = [i for i, input_hash in enumerate(input_hashes) if input_hash not in reused]
+        image_urls = self.fal_client.upload_files(image_paths) if pending else []
+
+        def generate(prompt):
+            filenames = [f"gen_{uuid.uuid4().hex[:12]}.png" for _ in range(variants)]
+            saved = self.fal_client.generate_scene_images(
+                prompt,
+                save_paths=[str(Config.IMAGES_DIR / f) for f in filenames],
+                image_urls=image_urls,
+            )
+            return [f"/media/images/{f}" for f in filenames[:len(saved)]]
+
+        outcomes = [None] * len(prompts)
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+                # Each worker keeps the caller's fal scheduling context
+                futures = [(i, executor.submit(contextvars.copy_context().run, generate, prompts[i]))
+                           for i in pending]
+                for i, future in futures:
+                    try:
+                        outcomes[i] = future.result()
+                    except Exception as e:
+                        outcomes[i] = e
+
+        rows = self._batch_rows(character, option, reference_image_path, prompts, input_hashes, outcomes)
+        media_ids = iter(self.db.save_media_v2_bulk(rows))
+        for row in rows:
+            get_thumbnail_worker().enqueue(row['file_path'])
+
+        return self._batch_results(prompts, input_hashes, outcomes, reused, media_ids)
+
     def prepare_video(self, character: dict, concept: str, option: str,
-                      reference_image_path: str = None) -> dict:
+                      reference_image_path: str = None, use_cache: bool = True) -> dict:
         """Prepare video: generate first frame + LLM video prompt.
 
-        Returns prepare result (not saved to DB yet).
+        The two stages are independent and run concurrently. Returns
+        prepare result (not saved to DB yet); raises PrepareVideoError
+        with per-stage errors if either stage fails.
         """
-        char_local = self._get_character_image_local(character)
+        image_paths = self._image_paths(character, option, reference_image_path)
         gen_id = uuid.uuid4().hex[:12]
 
-        # Step 1: Generate first frame image
+        # First frame image
         ff_filename = f"ff_{gen_id}.png"
         ff_save_path = Config.IMAGES_DIR / ff_filename
 
-        image_paths = [char_local]
-        if option == 'ref_image' and reference_image_path:
-            ref_local = self._get_local_path(reference_image_path)
-            if ref_local:
-                image_paths.append(ref_local)
-
         first_frame_prompt = f"A high-quality still frame of {character['name']}. {concept}"
-        self.fal_client.generate_scene_image_from_character(
+        image_future = self.executor.submit(
+            contextvars.copy_context().run,
+            self.fal_client.generate_scene_image_from_character,
             prompt=first_frame_prompt,
             image_paths=image_paths,
             save_path=str(ff_save_path)
         )
 
-        first_frame_url = f"/media/images/{ff_filename}"
-
-        # Step 2: Generate video prompt via LLM
-        video_prompt = self.llm_client.generate_video_prompt(character, concept)
-
-        return {
-            'prepare_id': gen_id,
-            'first_frame_path': first_frame_url,
-            'video_prompt': video_prompt,
-        }
+        # Video prompt via LLM (runs alongside the image)
+        prompt_future = self.executor.submit(self.llm_client.generate_video_prompt, character, concept,
+                                             use_cache=use_cache)
+
+        result = {'prepare_id': gen_id}
+        errors = {}
+        try:
+            image_future.result()
+            result['first_frame_path'] = f"/media/images/{ff_filename}"
+        except Exception as e:
+            errors['first_frame'] = str(e)
+        try:
+            result['video_prompt'] = prompt_future.result()
+        except Exception as e:
+            errors['video_prompt'] = str(e)
+
+        if errors:
+            raise PrepareVideoError(errors, result)
+        return result
 
     def finalize_video(self, character: dict, first_frame_path: str,
-                       video_prompt: str, concept: str) -> dict:
+                       video_prompt: str, concept: str, reuse: bool = False) -> dict:
         """Finalize video: first frame + edited video prompt → Grok image-to-video.
 
-        Duration is determined by LLM based on the final video prompt.
+        Duration is read from the prompt's "0-2s: ..." timeline when it has
+        a valid one, otherwise determined by the LLM. `duration_source` in
+        the result says which ('timeline' or 'llm'). With `reuse`, an
+        earlier video from the same first frame, prompt and duration is
+        returned instead of generating.
         """
         # Determine optimal duration from the final (possibly edited) prompt
-        duration = self.llm_client.determine_video_duration(video_prompt)
+        timeline = analyze_timeline(video_prompt)
+        if timeline['valid']:
+            duration, duration_source = timeline['duration'], 'timeline'
+        else:
+            duration, duration_source = self.llm_client.determine_video_duration(video_prompt), 'llm'
 
         ff_local = self._get_local_path(first_frame_path)
+        input_hash = self.fal_client.request_fingerprint(FalClient._video_request(video_prompt, duration, ff_local),
+                                                         [ff_local])
+        if reuse:
+            existing = self._reusable_media(character['id'], input_hash)
+            if existing:
+                return self._video_result(existing['id'], existing['file_path'], first_frame_path,
+                                          duration, duration_source, timeline, reused=True)
+
         gen_id = uuid.uuid4().hex[:12]
 
         video_filename = f"vid_{gen_id}.mp4"
@@ -364,13 +545,27 @@ class GenerateService:
             prompt=concept,
             video_prompt=video_prompt,
             first_frame_path=first_frame_path,
+            input_hash=input_hash,
         )
+        # Poster frame comes from the first frame we already have
+        get_thumbnail_worker().enqueue(video_url, first_frame_path)
 
-        return {
+        return self._video_result(media_id, video_url, first_frame_path, duration, duration_source, timeline)
+
+    @staticmethod
+    def _video_result(media_id, video_path, first_frame_path, duration, duration_source, timeline,
+                      reused=False) -> dict:
+        result = {
             'media_id': media_id,
-            'video_path': video_url,
+            'video_path': video_path,
             'first_frame_path': first_frame_path,
+            'duration': duration,
+            'duration_source': duration_source,
+            'timeline_issues': timeline['issues'],
         }
+        if reused:
+            result['reused'] = True
+        return result
 
     def generate_motion_video(self, character: dict, prompt: str,
                               driving_video_path: str) -> dict:
@@ -404,3 +599,176 @@ class GenerateService:
         )
 
         return {'media_id': media_id, 'video_path': video_url}
+
+
+class AsyncGenerateService(GenerateService):
+    """asyncio counterpart of GenerateService.
+
+    fal and OpenRouter calls are awaited on the event loop; Supabase
+    (sync-only client) calls run via asyncio.to_thread.
+    """
+
+    def __init__(self, fal_client: AsyncFalClient, llm_client: AsyncOpenRouterClient, db: Database):
+        self.fal_client = fal_client
+        self.llm_client = llm_client
+        self.db = db
+
+    async def generate_image(self, character: dict, prompt: str, option: str,
+                             reference_image_path: str = None, reuse: bool = False) -> dict:
+        image_paths = self._image_paths(character, option, reference_image_path)
+        input_hash = await asyncio.to_thread(
+            self.fal_client.request_fingerprint, FalClient._scene_request(prompt, image_paths, 1), image_paths)
+        if reuse:
+            existing = await asyncio.to_thread(self._reusable_media, character['id'], input_hash)
+            if existing:
+                return {'media_id': existing['id'], 'file_path': existing['file_path'], 'reused': True}
+
+        filename = f"gen_{uuid.uuid4().hex[:12]}.png"
+        await self.fal_client.generate_scene_image_from_character(
+            prompt=prompt,
+            image_paths=image_paths,
+            save_path=str(Config.IMAGES_DIR / filename)
+        )
+
+        file_url = f"/media/images/{filename}"
+        media_id = await asyncio.to_thread(
+            self.db.save_media_v2,
+            character_id=character['id'],
+            media_type='image',
+            file_path=file_url,
+            generation_mode=option,
+            prompt=prompt,
+            reference_image_path=reference_image_path,
+            input_hash=input_hash,
+        )
+        get_thumbnail_worker().enqueue(file_url)
+
+        return {'media_id': media_id, 'file_path': file_url}
+
+    async def generate_images(self, character: dict, prompts: list, variants: int, option: str,
+                              reference_image_path: str = None, max_concurrency: int = 4,
+                              reuse: bool = False) -> list:
+        image_paths = self._image_paths(character, option, reference_image_path)
+        input_hashes = await asyncio.to_thread(self._batch_input_hashes, prompts, variants, image_paths)
+        reused = await asyncio.to_thread(self._reusable_batch, character['id'], input_hashes, variants) \
+            if reuse else {}
+        pending = [i for i, input_hash in enumerate(input_hashes) if input_hash not in reused]
+        image_urls = await self.fal_client.upload_files(image_paths) if pending else []
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def generate(prompt):
+            filenames = [f"gen_{uuid.uuid4().hex[:12]}.png" for _ in range(variants)]
+            async with semaphore:
+                saved = await self.fal_client.generate_scene_images(
+                    prompt,
+                    save_paths=[str(Config.IMAGES_DIR / f) for f in filenames],
+                    image_urls=image_urls,
+                )
+            return [f"/media/images/{f}" for f in filenames[:len(saved)]]
+
+        outcomes = [None] * len(prompts)
+        generated = await asyncio.gather(*(generate(prompts[i]) for i in pending), return_exceptions=True)
+        for i, outcome in zip(pending, generated):
+            outcomes[i] = outcome
+
+        rows = self._batch_rows(character, option, reference_image_path, prompts, input_hashes, outcomes)
+        media_ids = iter(await asyncio.to_thread(self.db.save_media_v2_bulk, rows))
+        for row in rows:
+            get_thumbnail_worker().enqueue(row['file_path'])
+
+        return self._batch_results(prompts, input_hashes, outcomes, reused, media_ids)
+
+    async def prepare_video(self, character: dict, concept: str, option: str,
+                            reference_image_path: str = None, use_cache: bool = True) -> dict:
+        gen_id = uuid.uuid4().hex[:12]
+        ff_filename = f"ff_{gen_id}.png"
+
+        first_frame, video_prompt = await asyncio.gather(
+            self.fal_client.generate_scene_image_from_character(
+                prompt=f"A high-quality still frame of {character['name']}. {concept}",
+                image_paths=self._image_paths(character, option, reference_image_path),
+                save_path=str(Config.IMAGES_DIR / ff_filename)
+            ),
+            self.llm_client.generate_video_prompt(character, concept, use_cache=use_cache),
+            return_exceptions=True,
+        )
+
+        result = {'prepare_id': gen_id}
+        errors = {}
+        if isinstance(first_frame, Exception):
+            errors['first_frame'] = str(first_frame)
+        else:
+            result['first_frame_path'] = f"/media/images/{ff_filename}"
+        if isinstance(video_prompt, Exception):
+            errors['video_prompt'] = str(video_prompt)
+        else:
+            result['video_prompt'] = video_prompt
+
+        if errors:
+            raise PrepareVideoError(errors, result)
+        return result
+
+    async def finalize_video(self, character: dict, first_frame_path: str,
+                             video_prompt: str, concept: str, reuse: bool = False) -> dict:
+        timeline = analyze_timeline(video_prompt)
+        if timeline['valid']:
+            duration, duration_source = timeline['duration'], 'timeline'
+        else:
+            duration, duration_source = await self.llm_client.determine_video_duration(video_prompt), 'llm'
+
+        ff_local = self._get_local_path(first_frame_path)
+        input_hash = await asyncio.to_thread(
+            self.fal_client.request_fingerprint, FalClient._video_request(video_prompt, duration, ff_local), [ff_local])
+        if reuse:
+            existing = await asyncio.to_thread(self._reusable_media, character['id'], input_hash)
+            if existing:
+                return self._video_result(existing['id'], existing['file_path'], first_frame_path,
+                                          duration, duration_source, timeline, reused=True)
+
+        video_filename = f"vid_{uuid.uuid4().hex[:12]}.mp4"
+        await self.fal_client.generate_video(
+            prompt=video_prompt,
+            duration=duration,
+            save_path=str(Config.VIDEOS_DIR / video_filename),
+            image_path=ff_local
+        )
+
+        video_url = f"/media/videos/{video_filename}"
+        media_id = await asyncio.to_thread(
+            self.db.save_media_v2,
+            character_id=character['id'],
+            media_type='video',
+            file_path=video_url,
+            generation_mode='video',
+            prompt=concept,
+            video_prompt=video_prompt,
+            first_frame_path=first_frame_path,
+            input_hash=input_hash,
+        )
+        get_thumbnail_worker().enqueue(video_url, first_frame_path)
+
+        return self._video_result(media_id, video_url, first_frame_path, duration, duration_source, timeline)
+
+    async def generate_motion_video(self, character: dict, prompt: str,
+                                    driving_video_path: str) -> dict:
+        char_local = self._get_character_image_local(character)
+        video_filename = f"motion_{uuid.uuid4().hex[:12]}.mp4"
+
+        await self.fal_client.generate_motion_control_video(
+            image_path=char_local,
+            video_path=driving_video_path,
+            prompt=prompt,
+            save_path=str(Config.VIDEOS_DIR / video_filename)
+        )
+
+        video_url = f"/media/videos/{video_filename}"
+        media_id = await asyncio.to_thread(
+            self.db.save_media_v2,
+            character_id=character['id'],
+            media_type='video',
+            file_path=video_url,
+            generation_mode='motion_control',
+            prompt=prompt,
+        )
+
+        return {'media_id': media_id, 'video_path': video_url}
@@ -0,0 +1,125 @@
+from config import Config
+from pathlib import Path
+from PIL import Image, ImageOps
+import os
+import queue
+import tempfile
+import threading
+import traceback
+
+# Bounding-box widths of the WebP derivatives; height is capped at 2x width
+THUMBNAIL_SIZES = (320, 720)
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_filename(web_path: str, size: int) -> str:
+    return f"{Path(web_path).stem}_{size}.webp"
+
+
+def thumbnail_urls(web_path: str) -> dict:
+    """{size: /media/thumbs/... URL} for the derivatives of `web_path`."""
+    return {size: f"/media/thumbs/{thumbnail_filename(web_path, size)}" for size in THUMBNAIL_SIZES}
+
+
+def media_thumbnail_urls(media_type: str, file_path: str, first_frame_path: str = None):
+    """Thumbnail URLs for a media row, or None if it has no still to derive them from.
+
+    Images use their own file; videos use their first frame as poster.
+    """
+    if not file_path:
+        return None
+    if media_type == 'image' or first_frame_path:
+        return thumbnail_urls(file_path)
+    return None
+
+
+def make_thumbnails(source_path: str, web_path: str):
+    """Write every THUMBNAIL_SIZES WebP for `web_path`, reading pixels from `source_path`."""
+    Config.THUMBS_DIR.mkdir(parents=True, exist_ok=True)
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size in THUMBNAIL_SIZES:
+            thumb = img.copy()
+            thumb.thumbnail((size, size * 2), Image.LANCZOS)
+            target = Config.THUMBS_DIR / thumbnail_filename(web_path, size)
+            fd, tmp_path = tempfile.mkstemp(dir=str(Config.THUMBS_DIR), suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    thumb.save(f, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+                os.replace(tmp_path, target)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+
+def ensure_image_thumbnail(filename: str) -> bool:
+    """Create a missing image thumbnail on demand (e.g. for media saved before thumbnails existed).
+
+    Returns True if `filename` exists afterwards. Video posters can't be
+    recovered this way since the name doesn't identify the first frame.
+    """
+    if (Config.THUMBS_DIR / filename).exists():
+        return True
+    stem, _, rest = filename.rpartition('_')
+    if not stem or rest.removesuffix('.webp') not in {str(s) for s in THUMBNAIL_SIZES}:
+        return False
+    sources = [p for p in Config.IMAGES_DIR.glob(f"{stem}.*") if p.suffix.lower() in ('.png', '.jpg', '.jpeg', '.webp')]
+    if not sources:
+        return False
+    make_thumbnails(str(sources[0]), f"/media/images/{sources[0].name}")
+    return (Config.THUMBS_DIR / filename).exists()
+
+
+class ThumbnailWorker:
+    """Generates thumbnails on a background thread.
+
+    `enqueue(web_path, source_web_path)` returns immediately; the source
+    defaults to `web_path` itself (images) and is the first frame for
+    video posters.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.generated = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, web_path: str, source_web_path: str = None):
+        source_web_path = source_web_path or web_path
+        if web_path and source_web_path and source_web_path.startswith('/media/'):
+            self.queue.put((web_path, source_web_path))
+
+    def _run(self):
+        while True:
+            web_path, source_web_path = self.queue.get()
+            try:
+                make_thumbnails(str(Config.DATA_DIR / source_web_path[1:]), web_path)
+                self.generated += 1
+            except Exception:
+                self.failed += 1
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            'pending': self.queue.qsize(),
+            'generated': self.generated,
+            'failed': self.failed,
+        }
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_thumbnail_worker() -> ThumbnailWorker:
+    """Process-wide ThumbnailWorker."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = ThumbnailWorker()
+    return _worker
@@ -0,0 +1,91 @@
+from cache import TTLCache
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class UploadCache:
+    """SHA-256 -> fal upload URL cache.
+
+    URLs live in an in-memory LRU with a TTL. If `store_path` is set they
+    are also written to a JSON file (with absolute expiry times) so a
+    restart doesn't re-upload every character photo.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 6 * 3600, store_path: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.urls = TTLCache(maxsize=maxsize, ttl=ttl)
+        # (path, size, mtime) -> sha256, so unchanged files aren't re-hashed
+        self.digests = TTLCache(maxsize=maxsize * 4, ttl=ttl)
+        self.store_path = Path(store_path) if store_path else None
+        self._store_lock = threading.Lock()
+        self._load_store()
+
+    def digest(self, file_path: str) -> str:
+        st = os.stat(file_path)
+        stat_key = (str(file_path), st.st_size, st.st_mtime_ns)
+        digest = self.digests.get(stat_key)
+        if digest is None:
+            digest = file_sha256(file_path)
+            self.digests.set(stat_key, digest)
+        return digest
+
+    def get(self, digest: str):
+        return self.urls.get(digest)
+
+    def set(self, digest: str, url: str):
+        self.urls.set(digest, url)
+        if self.store_path:
+            self._save_entry(digest, url, time.time() + self.ttl)
+
+    def stats(self) -> dict:
+        return self.urls.stats()
+
+    def _load_store(self):
+        if not self.store_path or not self.store_path.exists():
+            return
+        try:
+            entries = json.loads(self.store_path.read_text())
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for digest, entry in entries.items():
+            remaining = entry.get('expires_at', 0) - now
+            if remaining > 0:
+                self.urls.set(digest, entry['url'], ttl=remaining)
+
+    def _save_entry(self, digest: str, url: str, expires_at: float):
+        with self._store_lock:
+            entries = {}
+            if self.store_path.exists():
+                try:
+                    entries = json.loads(self.store_path.read_text())
+                except (OSError, ValueError):
+                    entries = {}
+            now = time.time()
+            entries = {k: v for k, v in entries.items() if v.get('expires_at', 0) > now}
+            entries[digest] = {'url': url, 'expires_at': expires_at}
+            if len(entries) > self.maxsize:
+                newest = sorted(entries.items(), key=lambda kv: kv[1]['expires_at'])[-self.maxsize:]
+                entries = dict(newest)
+
+            self.store_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.store_path.parent), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.store_path)
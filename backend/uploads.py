@@ -0,0 +1,143 @@
+from flask import Request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from pathlib import Path
+import hashlib
+import os
+import tempfile
+
+# Allowance for multipart boundaries and small form fields on upload routes
+MULTIPART_OVERHEAD = 64 * 1024
+SNIFF_BYTES = 16
+
+
+def sniff_matches(ext: str, head: bytes) -> bool:
+    """Whether the first bytes of a file look like `ext`."""
+    if ext == 'png':
+        return head.startswith(b'\x89PNG\r\n\x1a\n')
+    if ext in ('jpg', 'jpeg'):
+        return head.startswith(b'\xff\xd8\xff')
+    if ext == 'webp':
+        return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    if ext in ('mp4', 'mov'):
+        return head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip')
+    if ext == 'webm':
+        return head.startswith(b'\x1a\x45\xdf\xa3')
+    return False
+
+
+class UploadRule:
+    """Where and how an endpoint's file uploads are streamed."""
+
+    def __init__(self, directory: Path, max_size: int, allowed_extensions: set, label: str):
+        self.directory = directory
+        self.max_size = max_size
+        self.allowed_extensions = allowed_extensions
+        self.label = label  # for error messages, e.g. 'Image'
+
+
+class StreamedUpload:
+    """Writable upload target that hashes, size-checks and sniffs as bytes arrive.
+
+    Data goes to a temp file in the final directory so it can be renamed
+    into place without a copy. Exceeding the limit or failing the magic
+    byte check aborts the request immediately.
+    """
+
+    def __init__(self, rule: UploadRule, ext: str):
+        self.rule = rule
+        self.ext = ext
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._head = b''
+        rule.directory.mkdir(parents=True, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=str(rule.directory), prefix='.upload_', suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.rule.max_size:
+            raise RequestEntityTooLarge(f"{self.rule.label} too large. Maximum {self.rule.max_size // (1024 * 1024)}MB.")
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES and not sniff_matches(self.ext, self._head):
+                raise UnsupportedMediaType('File content does not match its extension')
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def finish(self):
+        """Flush and run the content check for files shorter than SNIFF_BYTES."""
+        if not sniff_matches(self.ext, self._head):
+            raise UnsupportedMediaType('File content does not match its extension')
+        self._file.flush()
+
+    def discard(self):
+        self.close()
+        Path(self.path).unlink(missing_ok=True)
+
+    # File-like API used by werkzeug / FileStorage
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class UploadRequest(Request):
+    """Request class that streams multipart files for upload endpoints.
+
+    `upload_rules` maps endpoint name -> UploadRule. For those endpoints
+    the body limit is the rule's max size (so oversized Content-Length is
+    rejected before reading) and file parts are written through
+    StreamedUpload instead of werkzeug's spooled temp files.
+    """
+
+    upload_rules = {}
+
+    @property
+    def upload_rule(self):
+        return self.upload_rules.get(self.endpoint)
+
+    @property
+    def max_content_length(self):
+        rule = self.upload_rule
+        if rule is not None:
+            return rule.max_size + MULTIPART_OVERHEAD
+        return super().max_content_length
+
+    @max_content_length.setter
+    def max_content_length(self, value):
+        self._max_content_length = value
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        rule = self.upload_rule
+        if rule is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if ext not in rule.allowed_extensions:
+            raise BadRequest(f'Invalid file type. Allowed: {", ".join(rule.allowed_extensions)}')
+        if content_length and content_length > rule.max_size:
+            raise RequestEntityTooLarge(f"{rule.label} too large. Maximum {rule.max_size // (1024 * 1024)}MB.")
+
+        upload = StreamedUpload(rule, ext)
+        self.streamed_uploads.append(upload)
+        return upload
+
+    @property
+    def streamed_uploads(self) -> list:
+        if '_streamed_uploads' not in self.__dict__:
+            self.__dict__['_streamed_uploads'] = []
+        return self.__dict__['_streamed_uploads']
@@ -0,0 +1,16 @@
+"""WSGI entry point for production servers.
+
+    gunicorn --workers 4 --bind 0.0.0.0:8000 wsgi:application
+
+Each worker resumes unfinished jobs when it starts; job leases make sure
+only one of them takes each job. Don't use --preload: jobs would be
+queued on the master's thread pool, which forked workers don't inherit.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import app as application, recover_jobs
+
+recover_jobs()
@@ -0,0 +1,24 @@
+-- ============================================================
+-- Publish characters / content_plans changes so backend processes
+-- can invalidate their local read-through caches (DB_CACHE_REALTIME)
+-- ============================================================
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime' AND tablename = 'characters'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE public.characters;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime' AND tablename = 'content_plans'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE public.content_plans;
+  END IF;
+END $$;
+
+-- Deletes need the full old row (id, user_id) for invalidation
+ALTER TABLE public.characters REPLICA IDENTITY FULL;
+ALTER TABLE public.content_plans REPLICA IDENTITY FULL;
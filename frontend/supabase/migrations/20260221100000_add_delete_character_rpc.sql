@@ -0,0 +1,39 @@
+-- ============================================================
+-- delete_character_cascade: delete a character and everything hanging
+-- off it in one round trip. Returns the distinct media/image paths that
+-- were referenced so the caller can clean up files.
+-- ============================================================
+CREATE OR REPLACE FUNCTION public.delete_character_cascade(p_character_id UUID)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  freed TEXT[];
+BEGIN
+  SELECT COALESCE(array_agg(DISTINCT p) FILTER (WHERE p IS NOT NULL), '{}')
+  INTO freed
+  FROM (
+    SELECT unnest(ARRAY[m.file_path, m.first_frame_path]) AS p
+    FROM media m
+    WHERE m.character_id = p_character_id
+       OR m.plan_id IN (SELECT id FROM content_plans WHERE character_id = p_character_id)
+    UNION ALL
+    SELECT image_path FROM characters WHERE id = p_character_id
+  ) paths;
+
+  -- media_plan_id_fkey is ON DELETE SET NULL, so plan-linked media is removed explicitly
+  DELETE FROM media
+  WHERE plan_id IN (SELECT id FROM content_plans WHERE character_id = p_character_id);
+
+  -- Cascades to content_plans and media; jobs_character_id_fkey is ON DELETE
+  -- SET NULL, so the character's jobs stay with character_id cleared
+  DELETE FROM characters WHERE id = p_character_id;
+
+  RETURN freed;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.delete_character_cascade(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.delete_character_cascade(UUID) TO service_role;
@@ -0,0 +1,8 @@
+-- ============================================================
+-- Keyset pagination for media history: ORDER BY created_at DESC, id DESC
+-- ============================================================
+CREATE INDEX IF NOT EXISTS idx_media_created_at_id
+  ON media(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_media_character_created_at_id
+  ON media(character_id, created_at DESC, id DESC);
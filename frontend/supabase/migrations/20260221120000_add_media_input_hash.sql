@@ -0,0 +1,10 @@
+-- ============================================================
+-- Generation reuse: media rows remember a hash of their inputs
+-- (fal model + arguments + input file contents) so an identical
+-- request can return the existing file instead of regenerating.
+-- ============================================================
+ALTER TABLE media ADD COLUMN IF NOT EXISTS input_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_media_character_input_hash
+  ON media(character_id, input_hash, created_at DESC)
+  WHERE input_hash IS NOT NULL;
@@ -0,0 +1,11 @@
+-- ============================================================
+-- Job leases: the backend process that queued or is running a job
+-- owns it until lease_expires_at and keeps renewing it. Startup
+-- recovery only claims unfinished jobs whose lease has lapsed.
+-- ============================================================
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_unfinished
+  ON jobs(created_at)
+  WHERE status IN ('pending', 'processing');
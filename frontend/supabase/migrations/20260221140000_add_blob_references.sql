@@ -0,0 +1,80 @@
+-- ============================================================
+-- Uploaded blobs (content-addressed, shared between rows) are deleted
+-- only when nothing references them. blob_reference_count() counts the
+-- rows pointing at a blob's web path; blob_uploads keeps a just-uploaded
+-- blob alive until the row that will use it has been saved.
+-- ============================================================
+CREATE TABLE IF NOT EXISTS blob_uploads (
+  web_path     TEXT PRIMARY KEY,
+  uploaded_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE blob_uploads ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.blob_reference_count(p_web_path TEXT, p_grace_seconds INT DEFAULT 0)
+RETURNS BIGINT
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+      (SELECT count(*) FROM characters WHERE image_path = p_web_path)
+    + (SELECT count(*) FROM media
+       WHERE p_web_path IN (file_path, first_frame_path, reference_image_path))
+    -- Driving videos are passed to jobs as local paths ending in the web path
+    + (SELECT count(*) FROM jobs
+       WHERE status IN ('pending', 'processing')
+         AND input_data->>'driving_video_path' LIKE ('%' || p_web_path))
+    + (SELECT count(*) FROM blob_uploads
+       WHERE web_path = p_web_path
+         AND uploaded_at > now() - make_interval(secs => p_grace_seconds));
+$$;
+
+REVOKE ALL ON FUNCTION public.blob_reference_count(TEXT, INT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.blob_reference_count(TEXT, INT) TO service_role;
+
+-- delete_character_cascade now also returns the uploaded blobs the
+-- character's media and jobs used (reference images, driving videos) so
+-- the caller can release them. Only blob names (<prefix>_<sha256[:32]>.<ext>)
+-- are returned for those: other referenced files belong to other rows.
+CREATE OR REPLACE FUNCTION public.delete_character_cascade(p_character_id UUID)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  freed TEXT[];
+BEGIN
+  SELECT COALESCE(array_agg(DISTINCT p) FILTER (WHERE p IS NOT NULL), '{}')
+  INTO freed
+  FROM (
+    SELECT unnest(ARRAY[m.file_path, m.first_frame_path]) AS p
+    FROM media m
+    WHERE m.character_id = p_character_id
+       OR m.plan_id IN (SELECT id FROM content_plans WHERE character_id = p_character_id)
+    UNION ALL
+    SELECT image_path FROM characters WHERE id = p_character_id
+    UNION ALL
+    SELECT m.reference_image_path
+    FROM media m
+    WHERE m.character_id = p_character_id
+      AND m.reference_image_path ~ '/[a-z]+_[0-9a-f]{32}\.[a-z0-9]+$'
+    UNION ALL
+    SELECT substring(j.input_data->>'driving_video_path' FROM '/media/.*$')
+    FROM jobs j
+    WHERE j.character_id = p_character_id
+      AND j.input_data->>'driving_video_path' ~ '/media/videos/[a-z]+_[0-9a-f]{32}\.[a-z0-9]+$'
+  ) paths;
+
+  -- media_plan_id_fkey is ON DELETE SET NULL, so plan-linked media is removed explicitly
+  DELETE FROM media
+  WHERE plan_id IN (SELECT id FROM content_plans WHERE character_id = p_character_id);
+
+  -- Cascades to content_plans and media; jobs_character_id_fkey is ON DELETE
+  -- SET NULL, so the character's jobs stay with character_id cleared
+  DELETE FROM characters WHERE id = p_character_id;
+
+  RETURN freed;
+END;
+$$;
@@ -0,0 +1,7 @@
+-- ============================================================
+-- Fal scheduling priority of a job, recorded when it is queued:
+-- 'interactive' for generations a user is waiting on, 'batch' for bulk
+-- work. Recovered jobs run at the priority they were queued with.
+-- ============================================================
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS priority TEXT NOT NULL DEFAULT 'interactive'
+  CHECK (priority IN ('interactive', 'batch'));